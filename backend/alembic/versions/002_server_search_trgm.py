@@ -0,0 +1,30 @@
+"""Trigram indexes for server search
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.create_index('ix_servers_project_trgm', 'servers', ['project'],
+                    postgresql_using='gin', postgresql_ops={'project': 'gin_trgm_ops'})
+    op.create_index('ix_servers_ip_address_trgm', 'servers', ['ip_address'],
+                    postgresql_using='gin', postgresql_ops={'ip_address': 'gin_trgm_ops'})
+    op.create_index('ix_servers_comments_trgm', 'servers', ['comments'],
+                    postgresql_using='gin', postgresql_ops={'comments': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_servers_comments_trgm', table_name='servers')
+    op.drop_index('ix_servers_ip_address_trgm', table_name='servers')
+    op.drop_index('ix_servers_project_trgm', table_name='servers')
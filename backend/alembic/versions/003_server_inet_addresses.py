@@ -0,0 +1,77 @@
+"""Native inet server addresses and server_ips
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Returns NULL instead of raising for values that are not valid addresses
+    op.execute("""
+    CREATE FUNCTION cn_try_inet(value text) RETURNS inet AS $$
+    BEGIN
+        RETURN trim(value)::inet;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql IMMUTABLE;
+    """)
+
+    op.execute("""
+    DO $$ BEGIN
+        IF EXISTS (SELECT 1 FROM servers WHERE cn_try_inet(ip_address) IS NULL) THEN
+            RAISE EXCEPTION 'servers.ip_address has values that are not valid IP addresses, fix them before migrating';
+        END IF;
+    END $$;
+    """)
+
+    op.drop_index('ix_servers_ip_address_trgm', table_name='servers')
+    op.execute("ALTER TABLE servers ALTER COLUMN ip_address TYPE inet USING cn_try_inet(ip_address)")
+    op.create_index('ix_servers_ip_address_gist', 'servers', ['ip_address'],
+                    postgresql_using='gist', postgresql_ops={'ip_address': 'inet_ops'})
+    # Partial-address search ("10.20.") keeps a trigram index on the text form
+    op.execute("CREATE INDEX ix_servers_ip_host_trgm ON servers USING gin (host(ip_address) gin_trgm_ops)")
+
+    op.create_table('server_ips',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('server_id', sa.Integer(), nullable=False),
+                    sa.Column('ip_address', postgresql.INET(), nullable=False),
+                    sa.ForeignKeyConstraint(['server_id'], ['servers.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index(op.f('ix_server_ips_id'), 'server_ips', ['id'], unique=False)
+    op.create_index(op.f('ix_server_ips_server_id'), 'server_ips', ['server_id'], unique=False)
+    op.create_index('ix_server_ips_ip_address_gist', 'server_ips', ['ip_address'],
+                    postgresql_using='gist', postgresql_ops={'ip_address': 'inet_ops'})
+
+    op.execute("""
+    INSERT INTO server_ips (server_id, ip_address)
+    SELECT DISTINCT s.id, cn_try_inet(token)
+    FROM servers s, regexp_split_to_table(coalesce(s.additional_ips, ''), '[\\s,;]+') AS token
+    WHERE cn_try_inet(token) IS NOT NULL
+    """)
+
+    op.execute("DROP FUNCTION cn_try_inet(text)")
+
+
+def downgrade():
+    op.drop_index('ix_server_ips_ip_address_gist', table_name='server_ips')
+    op.drop_index(op.f('ix_server_ips_server_id'), table_name='server_ips')
+    op.drop_index(op.f('ix_server_ips_id'), table_name='server_ips')
+    op.drop_table('server_ips')
+
+    op.drop_index('ix_servers_ip_host_trgm', table_name='servers')
+    op.drop_index('ix_servers_ip_address_gist', table_name='servers')
+    op.execute("ALTER TABLE servers ALTER COLUMN ip_address TYPE varchar(45) USING host(ip_address)")
+    op.create_index('ix_servers_ip_address_trgm', 'servers', ['ip_address'],
+                    postgresql_using='gin', postgresql_ops={'ip_address': 'gin_trgm_ops'})
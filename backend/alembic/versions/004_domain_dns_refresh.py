@@ -0,0 +1,26 @@
+"""DNS refresh state on domains
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('domains', sa.Column('last_resolved_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('domains', sa.Column('resolution_error', sa.Text(), nullable=True))
+    op.create_index(op.f('ix_domains_last_resolved_at'), 'domains', ['last_resolved_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_domains_last_resolved_at'), table_name='domains')
+    op.drop_column('domains', 'resolution_error')
+    op.drop_column('domains', 'last_resolved_at')
@@ -0,0 +1,52 @@
+"""Resolved domain addresses for domain/server lookups
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('domain_addresses',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('domain_id', sa.Integer(), nullable=False),
+                    sa.Column('ip_address', postgresql.INET(), nullable=False),
+                    sa.Column('record_type', sa.String(length=4), nullable=False),
+                    sa.ForeignKeyConstraint(['domain_id'], ['domains.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index(op.f('ix_domain_addresses_id'), 'domain_addresses', ['id'], unique=False)
+    op.create_index(op.f('ix_domain_addresses_domain_id'), 'domain_addresses', ['domain_id'], unique=False)
+    op.create_index('ix_domain_addresses_ip_address_gist', 'domain_addresses', ['ip_address'],
+                    postgresql_using='gist', postgresql_ops={'ip_address': 'inet_ops'})
+
+    # Backfill from the records already stored on domains
+    op.execute("""
+    INSERT INTO domain_addresses (domain_id, ip_address, record_type)
+    SELECT DISTINCT d.id, value::inet, r.record_type
+    FROM domains d
+    CROSS JOIN LATERAL (
+        SELECT 'A' AS record_type, d.a_records AS records
+        UNION ALL
+        SELECT 'AAAA', d.aaaa_records
+    ) r
+    CROSS JOIN LATERAL json_array_elements_text(
+        CASE WHEN json_typeof(r.records) = 'array' THEN r.records ELSE '[]'::json END
+    ) AS value
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_domain_addresses_ip_address_gist', table_name='domain_addresses')
+    op.drop_index(op.f('ix_domain_addresses_domain_id'), table_name='domain_addresses')
+    op.drop_index(op.f('ix_domain_addresses_id'), table_name='domain_addresses')
+    op.drop_table('domain_addresses')
@@ -0,0 +1,21 @@
+"""Index servers.group_id for per-group server counts
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_servers_group_id'), 'servers', ['group_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_servers_group_id'), table_name='servers')
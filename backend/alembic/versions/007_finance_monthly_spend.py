@@ -0,0 +1,40 @@
+"""Monthly finance spend rollup
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+    CREATE MATERIALIZED VIEW finance_monthly_spend AS
+    SELECT date_trunc('month', f.payment_date AT TIME ZONE 'UTC')::date AS month,
+           f.group_id,
+           s.hoster,
+           s.country,
+           s.project,
+           f.currency::text AS currency,
+           sum(f.price) AS total,
+           count(*) AS accounts
+    FROM finance f
+    LEFT JOIN servers s ON s.id = f.server_id
+    WHERE f.payment_date IS NOT NULL
+    GROUP BY 1, 2, 3, 4, 5, 6
+    """)
+    # Required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute("""
+    CREATE UNIQUE INDEX ux_finance_monthly_spend
+    ON finance_monthly_spend (month, group_id, hoster, country, project, currency)
+    """)
+
+
+def downgrade():
+    op.execute("DROP MATERIALIZED VIEW finance_monthly_spend")
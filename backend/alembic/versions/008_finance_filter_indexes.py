@@ -0,0 +1,28 @@
+"""Composite indexes for finance filters
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_finance_payment_date_id', 'finance', ['payment_date', 'id'], unique=False)
+    op.create_index('ix_finance_server_id_payment_date', 'finance', ['server_id', 'payment_date'], unique=False)
+    op.create_index('ix_finance_group_id_payment_date', 'finance', ['group_id', 'payment_date'], unique=False)
+    op.create_index('ix_finance_account_status_payment_date', 'finance', ['account_status', 'payment_date'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_finance_account_status_payment_date', table_name='finance')
+    op.drop_index('ix_finance_group_id_payment_date', table_name='finance')
+    op.drop_index('ix_finance_server_id_payment_date', table_name='finance')
+    op.drop_index('ix_finance_payment_date_id', table_name='finance')
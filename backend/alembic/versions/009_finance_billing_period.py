@@ -0,0 +1,42 @@
+"""Recurring billing periods and the active payment-date index
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('finance', sa.Column('billing_period_months', sa.Integer(), nullable=True))
+
+    # The predicate has to use the label stored in this database's accountstatus type,
+    # which is 'Active' when created by 001 and 'ACTIVE' when created by the ORM
+    op.execute("""
+    DO $$
+    DECLARE active_label text;
+    BEGIN
+        SELECT e.enumlabel INTO active_label
+        FROM pg_enum e JOIN pg_type t ON t.oid = e.enumtypid
+        WHERE t.typname = 'accountstatus' AND e.enumlabel IN ('ACTIVE', 'Active')
+        ORDER BY e.enumlabel = 'ACTIVE' DESC
+        LIMIT 1;
+
+        EXECUTE format(
+            'CREATE INDEX ix_finance_active_payment_date ON finance (payment_date) WHERE account_status = %L',
+            active_label
+        );
+    END $$;
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_finance_active_payment_date', table_name='finance')
+    op.drop_column('finance', 'billing_period_months')
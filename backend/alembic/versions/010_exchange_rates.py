@@ -0,0 +1,31 @@
+"""Exchange rates for currency normalization
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exchange_rates',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('currency', sa.String(length=3), nullable=False),
+                    sa.Column('rate_date', sa.Date(), nullable=False),
+                    sa.Column('rate_to_usd', sa.Float(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('currency', 'rate_date', name='uq_exchange_rates_currency_rate_date')
+                    )
+    op.create_index(op.f('ix_exchange_rates_id'), 'exchange_rates', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_exchange_rates_id'), table_name='exchange_rates')
+    op.drop_table('exchange_rates')
@@ -0,0 +1,102 @@
+"""Partition history by month
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE history RENAME TO history_unpartitioned")
+    op.execute("ALTER INDEX history_pkey RENAME TO history_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_history_id RENAME TO ix_history_unpartitioned_id")
+
+    # The partition key has to be part of the primary key
+    op.execute("""
+    CREATE TABLE history (
+        id integer NOT NULL DEFAULT nextval('history_id_seq'),
+        action varchar(50) NOT NULL,
+        table_name varchar(50) NOT NULL,
+        record_id integer NOT NULL,
+        changes json,
+        timestamp timestamptz NOT NULL DEFAULT now(),
+        user_id integer REFERENCES users (id),
+        server_id integer REFERENCES servers (id),
+        domain_id integer REFERENCES domains (id),
+        finance_id integer REFERENCES finance (id),
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE history_id_seq OWNED BY history.id")
+
+    # Monthly partitions from the oldest entry to three months ahead;
+    # history_partitions.py keeps creating them from here on
+    op.execute("""
+    DO $$
+    DECLARE
+        month date := date_trunc('month', coalesce(
+            (SELECT min(timestamp) FROM history_unpartitioned), now()
+        ) AT TIME ZONE 'UTC')::date;
+        last_month date := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months')::date;
+    BEGIN
+        WHILE month <= last_month LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF history FOR VALUES FROM (%L) TO (%L)',
+                'history_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+                month, (month + interval '1 month')::date
+            );
+            month := (month + interval '1 month')::date;
+        END LOOP;
+    END $$;
+    """)
+
+    op.execute("""
+    INSERT INTO history (id, action, table_name, record_id, changes, timestamp, user_id, server_id, domain_id,
+                         finance_id)
+    SELECT id, action, table_name, record_id, changes, coalesce(timestamp, now()), user_id, server_id, domain_id,
+           finance_id
+    FROM history_unpartitioned
+    """)
+    op.execute("DROP TABLE history_unpartitioned")
+
+    op.create_index('ix_history_id', 'history', ['id'], unique=False)
+    op.execute("CREATE INDEX ix_history_server_id_timestamp ON history (server_id, timestamp DESC)")
+    op.execute("CREATE INDEX ix_history_domain_id_timestamp ON history (domain_id, timestamp DESC)")
+    op.execute("CREATE INDEX ix_history_finance_id_timestamp ON history (finance_id, timestamp DESC)")
+
+
+def downgrade():
+    op.execute("ALTER TABLE history RENAME TO history_partitioned")
+    op.execute("ALTER INDEX history_pkey RENAME TO history_partitioned_pkey")
+    op.execute("ALTER INDEX ix_history_id RENAME TO ix_history_partitioned_id")
+    op.execute("""
+    CREATE TABLE history (
+        id integer NOT NULL DEFAULT nextval('history_id_seq'),
+        action varchar(50) NOT NULL,
+        table_name varchar(50) NOT NULL,
+        record_id integer NOT NULL,
+        changes json,
+        timestamp timestamptz DEFAULT now(),
+        user_id integer REFERENCES users (id),
+        server_id integer REFERENCES servers (id),
+        domain_id integer REFERENCES domains (id),
+        finance_id integer REFERENCES finance (id),
+        CONSTRAINT history_pkey PRIMARY KEY (id)
+    )
+    """)
+    op.execute("ALTER SEQUENCE history_id_seq OWNED BY history.id")
+    op.execute("""
+    INSERT INTO history (id, action, table_name, record_id, changes, timestamp, user_id, server_id, domain_id,
+                         finance_id)
+    SELECT id, action, table_name, record_id, changes, timestamp, user_id, server_id, domain_id, finance_id
+    FROM history_partitioned
+    """)
+    op.execute("DROP TABLE history_partitioned")
+    op.create_index('ix_history_id', 'history', ['id'], unique=False)
@@ -0,0 +1,30 @@
+"""Index history for the paginated history feed
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Created on the partitioned parent, so every monthly partition gets them too
+    op.create_index('ix_history_timestamp_id', 'history', [sa.text('timestamp DESC'), sa.text('id DESC')], unique=False)
+    op.create_index(
+        'ix_history_table_name_record_id_timestamp', 'history',
+        ['table_name', 'record_id', sa.text('timestamp DESC')], unique=False
+    )
+    op.create_index('ix_history_user_id_timestamp', 'history', ['user_id', sa.text('timestamp DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_history_user_id_timestamp', table_name='history')
+    op.drop_index('ix_history_table_name_record_id_timestamp', table_name='history')
+    op.drop_index('ix_history_timestamp_id', table_name='history')
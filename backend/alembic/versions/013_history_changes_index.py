@@ -0,0 +1,24 @@
+"""Covering history index for the change feed
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_history_id_changes', 'history', ['id'], unique=False,
+        postgresql_include=['timestamp', 'table_name', 'record_id', 'action']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_history_id_changes', table_name='history')
@@ -0,0 +1,36 @@
+"""Entity snapshots for point-in-time reads
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('entity_snapshots',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('table_name', sa.String(length=50), nullable=False),
+                    sa.Column('record_id', sa.Integer(), nullable=False),
+                    sa.Column('taken_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.Column('state', sa.JSON(), nullable=False),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index(op.f('ix_entity_snapshots_id'), 'entity_snapshots', ['id'], unique=False)
+    op.create_index(
+        'ix_entity_snapshots_entity_taken_at', 'entity_snapshots', ['table_name', 'record_id', 'taken_at'],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_entity_snapshots_entity_taken_at', table_name='entity_snapshots')
+    op.drop_index(op.f('ix_entity_snapshots_id'), table_name='entity_snapshots')
+    op.drop_table('entity_snapshots')
@@ -0,0 +1,22 @@
+"""Lease column for the DNS refresher
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('domains', sa.Column('resolve_lease_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('domains', 'resolve_lease_until')
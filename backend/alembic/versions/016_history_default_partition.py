@@ -0,0 +1,31 @@
+"""Default partition for history
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '016'
+down_revision = '015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Without it, every audited write fails once the partitioner falls behind the calendar
+    op.execute("CREATE TABLE IF NOT EXISTS history_default PARTITION OF history DEFAULT")
+
+
+def downgrade():
+    # Rows here belong to months without a partition and would be lost
+    op.execute("""
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM history_default) THEN
+            RAISE EXCEPTION 'history_default is not empty; run the history partitioner first';
+        END IF;
+    END $$;
+    """)
+    op.execute("DROP TABLE history_default")
@@ -0,0 +1,36 @@
+"""Writing transaction id on history entries
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '017'
+down_revision = '016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A constant default fills existing entries without rewriting the table; they all committed long ago,
+    # so txid 0 orders them by id ahead of everything written from now on
+    op.add_column('history', sa.Column('txid', sa.BigInteger(), nullable=False, server_default='0'))
+    op.alter_column('history', 'txid', server_default=sa.text("(pg_current_xact_id()::text)::bigint"))
+
+    op.drop_index('ix_history_id_changes', table_name='history')
+    op.create_index(
+        'ix_history_txid_id_changes', 'history', ['txid', 'id'], unique=False,
+        postgresql_include=['table_name', 'record_id', 'action']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_history_txid_id_changes', table_name='history')
+    op.create_index(
+        'ix_history_id_changes', 'history', ['id'], unique=False,
+        postgresql_include=['timestamp', 'table_name', 'record_id', 'action']
+    )
+    op.drop_column('history', 'txid')
@@ -0,0 +1,52 @@
+from typing import Optional
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from models import History
+from events import queue_event
+from pagination import paginate, set_next_cursor
+
+# History rows of these tables also carry the entity in a dedicated FK column
+ENTITY_COLUMNS = {"servers": "server_id", "domains": "domain_id", "finance": "finance_id"}
+
+
+def history_row(action: str, table_name: str, record_id: int, changes, user_id):
+    row = {
+        "action": action,
+        "table_name": table_name,
+        "record_id": record_id,
+        # Dates, enums and addresses become plain JSON values
+        "changes": jsonable_encoder(changes),
+        "user_id": user_id,
+    }
+    entity_column = ENTITY_COLUMNS.get(table_name)
+    if entity_column:
+        row[entity_column] = record_id
+    return row
+
+
+def record_history(db: AsyncSession, action: str, table_name: str, record_id: int, changes, user_id):
+    # Added to the caller's session, so the audit row commits (or rolls back) with the change itself
+    db.add(History(**history_row(action, table_name, record_id, changes, user_id)))
+    queue_event(db, action, table_name, record_id, user_id)
+
+
+async def record_history_bulk(db: AsyncSession, rows):
+    if rows:
+        await db.execute(insert(History), rows)
+        for row in rows:
+            queue_event(db, row["action"], row["table_name"], row["record_id"], row["user_id"])
+
+
+async def read_history(db: AsyncSession, response: Response, conditions, cursor: Optional[str], limit: int):
+    # Newest first; the (timestamp, id) keyset also lets Postgres prune monthly partitions
+    query = select(History).options(joinedload(History.user)).where(*conditions)
+    keys = [(History.timestamp, True), (History.id, True)]
+    result = await db.execute(paginate(query, keys, cursor, 0, limit))
+    entries = result.scalars().all()
+    set_next_cursor(response, entries, limit, lambda entry: [entry.timestamp, entry.id])
+    return entries
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Every periodic job started by this worker, reported by /api/system/tasks
+periodic_tasks = {}
+
+
+class PeriodicTask:
+    def __init__(self, name: str, interval: float, func, initial_delay: float = 0):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.initial_delay = initial_delay
+        self._task = None
+
+        self.runs = 0
+        self.failures = 0
+        self.last_started_at = None
+        self.last_duration = None
+        self.last_error = None
+        periodic_tasks[name] = self
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self):
+        self.last_started_at = time.time()
+        started = time.perf_counter()
+        try:
+            await self.func()
+            self.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.exception("Periodic task %s failed", self.name)
+        finally:
+            self.runs += 1
+            self.last_duration = time.perf_counter() - started
+
+    async def _run(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def status(self):
+        return {
+            "name": self.name,
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started_at": self.last_started_at,
+            "last_duration_ms": round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+        }
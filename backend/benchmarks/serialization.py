@@ -0,0 +1,84 @@
+"""Serialization micro-benchmark for list endpoints.
+
+Compares, against the database in DATABASE_URL, the two ways of turning a page of
+servers into a response body:
+
+  orm:  select(Server) -> ServerResponse validation (from_attributes) -> stdlib json,
+        which is what FastAPI does for a response_model
+  rows: select(<ServerResponse columns>) -> orjson, the path used by the list endpoints
+
+Both bodies are checked to decode to the same JSON before timing. Run from backend/:
+
+    python benchmarks/serialization.py --rows 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from models import Server  # noqa: E402
+from schemas import ServerResponse  # noqa: E402
+from serialization import FastJSONResponse, response_columns  # noqa: E402
+
+servers_adapter = TypeAdapter(List[ServerResponse])
+server_columns = response_columns(Server, ServerResponse)
+
+
+async def orm_body(rows: int) -> bytes:
+    async with SessionLocal() as db:
+        result = await db.execute(select(Server).order_by(Server.id).limit(rows))
+        servers = result.scalars().all()
+    # Mirrors FastAPI's serialize_response + JSONResponse.render
+    content = servers_adapter.dump_python(servers_adapter.validate_python(servers, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+async def rows_body(rows: int) -> bytes:
+    async with SessionLocal() as db:
+        result = await db.execute(select(*server_columns).order_by(Server.id).limit(rows))
+        servers = result.all()
+    return FastJSONResponse([dict(row._mapping) for row in servers]).body
+
+
+async def measure(func, rows: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func(rows)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+
+async def run(rows: int, repeat: int):
+    orm, fast = await orm_body(rows), await rows_body(rows)
+    if json.loads(orm) != json.loads(fast):
+        raise SystemExit("orm and rows paths produce different JSON")
+    print(f"rows:        {len(json.loads(fast))} ({len(fast)} bytes)")
+
+    for name, func in (("orm", orm_body), ("rows", rows_body)):
+        timings = await measure(func, rows, repeat)
+        print(f"{name:5} p50: {statistics.median(timings) * 1000:7.2f} ms   "
+              f"min: {timings[0] * 1000:7.2f} ms")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Throughput benchmark for the ControlNode API.
+
+Runs against a live server, so the same script measures the tree before and
+after a change:
+
+    python benchmarks/throughput.py --url http://localhost:8000 --endpoint /api/servers/ \
+        --concurrency 50 --requests 2000
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def login(base_url, username, password):
+    request = urllib.request.Request(
+        f"{base_url}/api/login",
+        data=json.dumps({"username": username, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)["access_token"]
+
+
+def timed_get(url, token):
+    request = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/api/servers/")
+    parser.add_argument("--username", default="superadmin")
+    parser.add_argument("--password", default="Admin123!")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = login(args.url, args.username, args.password)
+    url = f"{args.url}{args.endpoint}"
+
+    # Warm up connections and caches
+    for _ in range(10):
+        timed_get(url, token)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = sorted(pool.map(lambda _: timed_get(url, token), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"endpoint:    {args.endpoint}")
+    print(f"concurrency: {args.concurrency}")
+    print(f"requests:    {args.requests}")
+    print(f"throughput:  {args.requests / elapsed:.1f} req/s")
+    print(f"latency p50: {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"latency p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import codecs
+import csv
+import json
+
+
+async def iter_lines(stream):
+    # Decodes a byte stream incrementally and yields complete lines without buffering the whole body
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_records(stream):
+    # Yields (row_number, record, error); quoted fields may span lines
+    header = None
+    buffered = None
+    row_number = 0
+
+    async for line in iter_lines(stream):
+        buffered = line if buffered is None else f"{buffered}\n{line}"
+        if buffered.count('"') % 2:
+            continue
+
+        logical_line, buffered = buffered, None
+        if not logical_line.strip():
+            continue
+
+        values = next(csv.reader([logical_line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+
+        # Empty cells fall back to the schema defaults
+        yield row_number, {name: value for name, value in zip(header, values) if value != ""}, None
+
+    if buffered is not None:
+        yield row_number + 1, None, "Unterminated quoted field"
+
+
+async def iter_ndjson_records(stream):
+    row_number = 0
+    async for line in iter_lines(stream):
+        if not line.strip():
+            continue
+
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+
+        if not isinstance(record, dict):
+            yield row_number, None, "Expected a JSON object"
+            continue
+        yield row_number, record, None
@@ -0,0 +1,136 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, or_, and_, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from background import PeriodicTask
+from database import SessionLocal
+from dns_resolver import dns_resolver
+from models import Domain, DomainAddress
+
+logger = logging.getLogger(__name__)
+
+DNS_REFRESH_INTERVAL = float(os.getenv("DNS_REFRESH_INTERVAL", "60"))  # 0 disables the refresher
+DNS_REFRESH_TTL = float(os.getenv("DNS_REFRESH_TTL", "3600"))
+DNS_REFRESH_ERROR_RETRY = float(os.getenv("DNS_REFRESH_ERROR_RETRY", "300"))
+DNS_REFRESH_BATCH_SIZE = int(os.getenv("DNS_REFRESH_BATCH_SIZE", "50"))
+DNS_REFRESH_MAX_BATCHES = int(os.getenv("DNS_REFRESH_MAX_BATCHES", "20"))
+# How long a claimed batch stays reserved; a worker that dies mid-batch releases it after this
+DNS_REFRESH_LEASE = float(os.getenv("DNS_REFRESH_LEASE", "300"))
+
+
+def apply_dns_records(domain: Domain, records, error):
+    # Failed lookups keep the previously stored records
+    if records.get("NS") is not None:
+        domain.ns_records = records["NS"]
+    if records.get("A") is not None:
+        domain.a_records = records["A"]
+    if records.get("AAAA") is not None:
+        domain.aaaa_records = records["AAAA"]
+    domain.resolution_error = error
+    domain.last_resolved_at = datetime.now(timezone.utc)
+
+
+async def replace_domain_addresses(db: AsyncSession, domains):
+    # Rebuilds the domain_addresses rows from the stored A/AAAA records
+    if not domains:
+        return
+
+    await db.execute(delete(DomainAddress).where(DomainAddress.domain_id.in_([domain.id for domain in domains])))
+    rows = [
+        {"domain_id": domain.id, "ip_address": address, "record_type": record_type}
+        for domain in domains
+        for record_type, addresses in (("A", domain.a_records), ("AAAA", domain.aaaa_records))
+        for address in dict.fromkeys(addresses or [])
+    ]
+    if rows:
+        await db.execute(insert(DomainAddress), rows)
+
+
+async def refresh_domain(db: AsyncSession, domain: Domain):
+    # The domain must already be flushed so its id is known
+    records, error = await dns_resolver.resolve_domain(domain.domain_name)
+    apply_dns_records(domain, records, error)
+    await replace_domain_addresses(db, [domain])
+
+
+async def refresh_domains(db: AsyncSession, domains):
+    # Resolves the whole batch concurrently, then applies the results
+    results = await dns_resolver.resolve_many([domain.domain_name for domain in domains])
+    for domain in domains:
+        apply_dns_records(domain, *results[domain.domain_name])
+    await replace_domain_addresses(db, domains)
+
+
+def due_for_refresh(now: datetime):
+    return and_(
+        or_(
+            Domain.last_resolved_at.is_(None),
+            Domain.last_resolved_at < now - timedelta(seconds=DNS_REFRESH_TTL),
+            and_(
+                Domain.resolution_error.isnot(None),
+                Domain.last_resolved_at < now - timedelta(seconds=DNS_REFRESH_ERROR_RETRY),
+            ),
+        ),
+        or_(Domain.resolve_lease_until.is_(None), Domain.resolve_lease_until < now),
+    )
+
+
+async def claim_due_domains():
+    # Short transaction: SKIP LOCKED picks rows no other worker is claiming, the lease keeps
+    # them reserved after commit, so no lock or connection is held while resolving
+    now = datetime.now(timezone.utc)
+    async with SessionLocal() as db:
+        due = (
+            select(Domain.id)
+            .where(due_for_refresh(now))
+            .order_by(Domain.last_resolved_at.asc().nulls_first())
+            .limit(DNS_REFRESH_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(Domain)
+            .where(Domain.id.in_(due.scalar_subquery()))
+            # updated_at is kept: claiming is not an edit
+            .values(resolve_lease_until=now + timedelta(seconds=DNS_REFRESH_LEASE), updated_at=Domain.updated_at)
+            .returning(Domain.id, Domain.domain_name)
+        )
+        claimed = dict(result.all())
+        await db.commit()
+    return claimed
+
+
+async def store_refresh_results(claimed, results):
+    async with SessionLocal() as db:
+        result = await db.execute(select(Domain).where(Domain.id.in_(list(claimed))))
+        domains = []
+        for domain in result.scalars().all():
+            domain.resolve_lease_until = None
+            # Renamed while resolving: the answer is for the old name, the rename refreshed it already
+            if domain.domain_name == claimed[domain.id]:
+                apply_dns_records(domain, *results[domain.domain_name])
+                domains.append(domain)
+        await replace_domain_addresses(db, domains)
+        await db.commit()
+    return len(domains)
+
+
+async def refresh_due_domains():
+    refreshed = 0
+    for _ in range(DNS_REFRESH_MAX_BATCHES):
+        claimed = await claim_due_domains()
+        if not claimed:
+            break
+        results = await dns_resolver.resolve_many(list(dict.fromkeys(claimed.values())))
+        refreshed += await store_refresh_results(claimed, results)
+
+        if len(claimed) < DNS_REFRESH_BATCH_SIZE:
+            break
+
+    if refreshed:
+        logger.info("Refreshed DNS records for %d domains", refreshed)
+
+
+dns_refresher = PeriodicTask("dns-refresh", DNS_REFRESH_INTERVAL, refresh_due_domains, initial_delay=5)
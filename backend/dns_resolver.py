@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from cache import TTLCache
+
+# Comma-separated nameservers; empty uses the system resolver configuration
+DNS_NAMESERVERS = os.getenv("DNS_NAMESERVERS", "")
+DNS_PORT = int(os.getenv("DNS_PORT", "53"))
+DNS_QUERY_TIMEOUT = float(os.getenv("DNS_QUERY_TIMEOUT", "3"))
+DNS_CONCURRENCY = int(os.getenv("DNS_CONCURRENCY", "50"))
+DNS_CACHE_SIZE = int(os.getenv("DNS_CACHE_SIZE", "10000"))
+# Upper bound for cached positive answers, whatever TTL the zone publishes
+DNS_CACHE_MAX_TTL = float(os.getenv("DNS_CACHE_MAX_TTL", "3600"))
+# NXDOMAIN / NoAnswer results are cached this long
+DNS_NEGATIVE_TTL = float(os.getenv("DNS_NEGATIVE_TTL", "60"))
+
+RECORD_TYPES = ("NS", "A", "AAAA")
+
+
+def _rdata_value(rdtype: str, rdata):
+    return str(rdata.target) if rdtype == "NS" else str(rdata.address)
+
+
+class DNSResolver:
+    # Resolves many (domain, record type) pairs concurrently with a bounded number of
+    # in-flight queries; answers are cached for the TTL published in the zone.
+
+    def __init__(self, nameservers=None, port: int = 53, timeout: float = 3, concurrency: int = 50,
+                 cache_size: int = 10000, max_ttl: float = 3600, negative_ttl: float = 60):
+        self.nameservers = list(nameservers or [])
+        self.port = port
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(maxsize=cache_size, ttl=max_ttl)
+        self._resolver = None
+        self._semaphore = None
+
+        self.queries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+
+    def _get_resolver(self):
+        if self._resolver is None:
+            resolver = dns.asyncresolver.Resolver(configure=not self.nameservers)
+            if self.nameservers:
+                resolver.nameservers = self.nameservers
+            resolver.port = self.port
+            resolver.timeout = self.timeout
+            resolver.lifetime = self.timeout
+            # Answers are cached by TTLCache, not by dnspython
+            resolver.cache = None
+            self._resolver = resolver
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._resolver
+
+    async def resolve(self, name: str, rdtype: str):
+        # Returns (values, error); values is None when the lookup failed and nothing is known
+        key = (name.lower(), rdtype)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        resolver = self._get_resolver()
+        async with self._semaphore:
+            self.queries += 1
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                answer = await resolver.resolve(name, rdtype, lifetime=self.timeout)
+            except dns.resolver.NoAnswer:
+                result, ttl = ([], None), self.negative_ttl
+            except dns.resolver.NXDOMAIN:
+                result, ttl = ([], "domain does not exist"), self.negative_ttl
+            except dns.exception.Timeout:
+                self.failures += 1
+                return None, f"timed out after {self.timeout}s"
+            except dns.exception.DNSException as e:
+                self.failures += 1
+                return None, str(e) or e.__class__.__name__
+            else:
+                result = ([_rdata_value(rdtype, rdata) for rdata in answer], None)
+                ttl = min(answer.rrset.ttl, self.max_ttl)
+            finally:
+                self.in_flight -= 1
+                self.total_seconds += time.perf_counter() - started
+
+        self.cache.set(key, result, ttl)
+        return result
+
+    async def resolve_domain(self, name: str):
+        # Returns ({rdtype: values or None}, combined error message or None)
+        results = await asyncio.gather(*[self.resolve(name, rdtype) for rdtype in RECORD_TYPES])
+
+        records = {}
+        errors = []
+        for rdtype, (values, error) in zip(RECORD_TYPES, results):
+            records[rdtype] = values
+            if error:
+                errors.append(f"{rdtype}: {error}")
+        return records, "; ".join(errors) or None
+
+    async def resolve_many(self, names):
+        # All domains and record types are in flight at once, bounded by the semaphore
+        unique = list(dict.fromkeys(names))
+        results = await asyncio.gather(*[self.resolve_domain(name) for name in unique])
+        return dict(zip(unique, results))
+
+    def stats(self):
+        return {
+            "nameservers": self.nameservers or "system",
+            "port": self.port,
+            "timeout_seconds": self.timeout,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queries": self.queries,
+            "failures": self.failures,
+            "avg_ms": round(self.total_seconds / self.queries * 1000, 1) if self.queries else 0.0,
+            "cache": self.cache.stats(),
+        }
+
+
+dns_resolver = DNSResolver(
+    nameservers=[ns.strip() for ns in DNS_NAMESERVERS.split(",") if ns.strip()],
+    port=DNS_PORT,
+    timeout=DNS_QUERY_TIMEOUT,
+    concurrency=DNS_CONCURRENCY,
+    cache_size=DNS_CACHE_SIZE,
+    max_ttl=DNS_CACHE_MAX_TTL,
+    negative_ttl=DNS_NEGATIVE_TTL,
+)
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import os
+
+import asyncpg
+from sqlalchemy import event, select, func
+from sqlalchemy.orm import Session
+
+from background import PeriodicTask
+from database import engine
+from models import Server, Finance
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "controlnode_events"
+# Events buffered per client; a client that falls this far behind is disconnected and must resync
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_RECONNECT_DELAY = float(os.getenv("EVENTS_RECONNECT_DELAY", "5"))  # 0 disables the listener
+EVENTS_KEEPALIVE_INTERVAL = float(os.getenv("EVENTS_KEEPALIVE_INTERVAL", "30"))
+# Events per NOTIFY; keeps payloads well under the 8000 byte limit
+EVENTS_NOTIFY_BATCH = 50
+
+PENDING_EVENTS = "pending_events"
+
+# Tables whose events carry the owning group, looked up when the transaction commits
+GROUP_MODELS = {"servers": Server, "finance": Finance}
+
+
+def queue_event(db, action: str, table_name: str, record_id: int, user_id):
+    # Sent with the transaction that writes the History row (see notify_pending_events)
+    db.info.setdefault(PENDING_EVENTS, []).append({
+        "table": table_name, "id": record_id, "action": action, "user_id": user_id
+    })
+
+
+def group_ids(session: Session, table_name: str, ids):
+    model = GROUP_MODELS[table_name]
+    result = session.execute(select(model.id, model.group_id).where(model.id.in_(ids)))
+    return dict(result.all())
+
+
+@event.listens_for(Session, "before_commit")
+def notify_pending_events(session: Session):
+    pending = session.info.pop(PENDING_EVENTS, None)
+    if not pending:
+        return
+
+    # NOTIFY is transactional: listeners only hear about changes that actually commit
+    session.flush()
+    for table_name in GROUP_MODELS:
+        ids = {item["id"] for item in pending if item["table"] == table_name}
+        if ids:
+            groups = group_ids(session, table_name, ids)
+            for item in pending:
+                if item["table"] == table_name:
+                    item["group_id"] = groups.get(item["id"])
+    for item in pending:
+        if item["table"] == "groups":
+            item["group_id"] = item["id"]
+
+    for start in range(0, len(pending), EVENTS_NOTIFY_BATCH):
+        payload = json.dumps(pending[start:start + EVENTS_NOTIFY_BATCH], separators=(",", ":"))
+        session.execute(select(func.pg_notify(EVENTS_CHANNEL, payload)))
+
+
+@event.listens_for(Session, "after_rollback")
+def drop_pending_events(session: Session):
+    session.info.pop(PENDING_EVENTS, None)
+
+
+class Subscriber:
+    def __init__(self, tables=None, groups=None, maxsize: int = EVENTS_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize)
+        self.evicted = False
+        self.set_filters(tables, groups)
+
+    def set_filters(self, tables=None, groups=None):
+        # None means no filter; an event without a group never matches a group filter
+        self.tables = set(tables) if tables else None
+        self.groups = set(groups) if groups else None
+
+    def wants(self, item):
+        if item.get("type") != "change":
+            return True
+        if self.tables is not None and item["table"] not in self.tables:
+            return False
+        return self.groups is None or item.get("group_id") in self.groups
+
+
+class EventHub:
+    def __init__(self):
+        self.subscribers = set()
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self, tables=None, groups=None):
+        subscriber = Subscriber(tables, groups)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def evict(self, subscriber: Subscriber):
+        # The client is told to resync instead of silently missing events; None ends its stream
+        self.unsubscribe(subscriber)
+        self.evictions += 1
+        subscriber.evicted = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def publish(self, item):
+        self.published += 1
+        for subscriber in list(self.subscribers):
+            if subscriber.wants(item):
+                try:
+                    subscriber.queue.put_nowait(item)
+                except asyncio.QueueFull:
+                    self.evict(subscriber)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "evictions": self.evictions,
+            "queue_size": EVENTS_QUEUE_SIZE,
+            "max_queued": max((subscriber.queue.qsize() for subscriber in self.subscribers), default=0),
+        }
+
+
+event_hub = EventHub()
+
+
+def on_notification(connection, pid, channel, payload):
+    try:
+        items = json.loads(payload)
+    except ValueError:
+        logger.warning("Ignoring malformed event payload on %s", channel)
+        return
+    for item in items:
+        event_hub.publish({"type": "change", **item})
+
+
+async def listen_for_events():
+    # One LISTEN connection per worker, outside the pool; returns (and is restarted) when it drops
+    connection = await asyncpg.connect(engine.url.set(drivername="postgresql").render_as_string(hide_password=False))
+    try:
+        await connection.add_listener(EVENTS_CHANNEL, on_notification)
+        # Anything sent while this worker was not listening is lost; clients catch up via /api/changes
+        event_hub.publish({"type": "resync"})
+        while True:
+            await asyncio.sleep(EVENTS_KEEPALIVE_INTERVAL)
+            await connection.execute("SELECT 1")
+    finally:
+        await connection.close(timeout=5)
+
+
+events_listener = PeriodicTask("events-listener", EVENTS_RECONNECT_DELAY, listen_for_events)
@@ -0,0 +1,125 @@
+import csv
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import select, case, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from database import SessionLocal
+from models import ExchangeRate, Currency
+
+logger = logging.getLogger(__name__)
+
+# Optional CSV (currency,rate_date,rate_to_usd) loaded into exchange_rates on startup
+EXCHANGE_RATES_FILE = os.getenv("EXCHANGE_RATES_FILE", "")
+EXCHANGE_RATE_CACHE_TTL = float(os.getenv("EXCHANGE_RATE_CACHE_TTL", "3600"))
+
+# Keeps multi-row upserts well under the bind parameter limit
+UPSERT_CHUNK_SIZE = 5000
+
+# Rates are stored against USD, which needs no entry of its own
+PIVOT_CURRENCY = "USD"
+
+# (currency, date) -> rate_to_usd for conversions done in Python; cleared when rates change
+rate_cache = TTLCache(maxsize=4096, ttl=EXCHANGE_RATE_CACHE_TTL)
+
+
+def rate_to_usd(currency, day):
+    # SQL expression: the latest rate on or before `day`, served by the (currency, rate_date) unique index
+    latest = (
+        select(ExchangeRate.rate_to_usd)
+        .where(ExchangeRate.currency == currency, ExchangeRate.rate_date <= day)
+        .order_by(ExchangeRate.rate_date.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return case((currency == PIVOT_CURRENCY, literal(1.0)), else_=latest)
+
+
+def convert(amount, currency, day, base_currency: str):
+    # SQL expression converting `amount` from the `currency` column to base_currency; NULL without a rate.
+    # Amounts already in base_currency need no rate, as in convert_amount
+    if base_currency == PIVOT_CURRENCY:
+        converted = amount * rate_to_usd(currency, day)
+    else:
+        converted = amount * rate_to_usd(currency, day) / rate_to_usd(literal(base_currency), day)
+    return case((currency == base_currency, amount), else_=converted)
+
+
+async def get_rate(db: AsyncSession, currency: str, day: date):
+    if currency == PIVOT_CURRENCY:
+        return 1.0
+
+    key = (currency, day)
+    rate = rate_cache.get(key)
+    if rate is None:
+        rate = await db.scalar(
+            select(ExchangeRate.rate_to_usd)
+            .where(ExchangeRate.currency == currency, ExchangeRate.rate_date <= day)
+            .order_by(ExchangeRate.rate_date.desc())
+            .limit(1)
+        )
+        if rate is not None:
+            rate_cache.set(key, rate)
+    return rate
+
+
+async def convert_amount(db: AsyncSession, amount: float, currency: str, day: date, base_currency: str):
+    if currency == base_currency:
+        return amount
+
+    rate = await get_rate(db, currency, day)
+    base_rate = await get_rate(db, base_currency, day)
+    if rate is None or base_rate is None:
+        return None
+    return amount * rate / base_rate
+
+
+async def upsert_rates(db: AsyncSession, rates):
+    # rates: dicts with currency, rate_date and rate_to_usd. ON CONFLICT cannot update a row twice
+    # in one statement, so repeated (currency, rate_date) pairs are collapsed, the last one winning
+    rates = list({(rate["currency"], rate["rate_date"]): rate for rate in rates}.values())
+    for start in range(0, len(rates), UPSERT_CHUNK_SIZE):
+        statement = insert(ExchangeRate).values(rates[start:start + UPSERT_CHUNK_SIZE])
+        await db.execute(statement.on_conflict_do_update(
+            constraint="uq_exchange_rates_currency_rate_date",
+            set_={"rate_to_usd": statement.excluded.rate_to_usd}
+        ))
+    rate_cache.clear()
+
+
+def read_rates_file(path: str):
+    with open(path, newline="") as rates_file:
+        return [
+            {
+                # Currency() raises ValueError for codes the API cannot return
+                "currency": Currency(row["currency"].strip().upper()).value,
+                "rate_date": date.fromisoformat(row["rate_date"].strip()),
+                "rate_to_usd": float(row["rate_to_usd"]),
+            }
+            for row in csv.DictReader(rates_file)
+        ]
+
+
+async def load_rates_file():
+    if not EXCHANGE_RATES_FILE:
+        return
+
+    try:
+        rates = read_rates_file(EXCHANGE_RATES_FILE)
+    except (OSError, KeyError, ValueError) as e:
+        logger.error("Could not load exchange rates from %s: %s", EXCHANGE_RATES_FILE, e)
+        return
+
+    async with SessionLocal() as db:
+        try:
+            await upsert_rates(db, rates)
+            await db.commit()
+        except DBAPIError as e:
+            logger.error("Could not store exchange rates from %s: %s", EXCHANGE_RATES_FILE, e.orig)
+            return
+    logger.info("Loaded %d exchange rates from %s", len(rates), EXCHANGE_RATES_FILE)
@@ -0,0 +1,84 @@
+import os
+import time
+
+from sqlalchemy import text, table, column, Date, Integer, String, Float
+
+from background import PeriodicTask
+from database import engine
+
+FINANCE_ROLLUP_INTERVAL = float(os.getenv("FINANCE_ROLLUP_INTERVAL", "10"))  # 0 disables the refresher
+# Full refresh even without local changes, picks up edits made by other workers and to servers
+FINANCE_ROLLUP_MAX_AGE = float(os.getenv("FINANCE_ROLLUP_MAX_AGE", "900"))
+
+# Monthly spend per group, hoster, country, project and currency. The unique index is
+# required by REFRESH MATERIALIZED VIEW CONCURRENTLY, so readers are never blocked.
+FINANCE_ROLLUP_DDL = (
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS finance_monthly_spend AS
+    SELECT date_trunc('month', f.payment_date AT TIME ZONE 'UTC')::date AS month,
+           f.group_id,
+           s.hoster,
+           s.country,
+           s.project,
+           f.currency::text AS currency,
+           sum(f.price) AS total,
+           count(*) AS accounts
+    FROM finance f
+    LEFT JOIN servers s ON s.id = f.server_id
+    WHERE f.payment_date IS NOT NULL
+    GROUP BY 1, 2, 3, 4, 5, 6
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_finance_monthly_spend
+    ON finance_monthly_spend (month, group_id, hoster, country, project, currency)
+    """,
+)
+
+finance_monthly_spend = table(
+    "finance_monthly_spend",
+    column("month", Date),
+    column("group_id", Integer),
+    column("hoster", String),
+    column("country", String),
+    column("project", String),
+    column("currency", String),
+    column("total", Float),
+    column("accounts", Integer),
+)
+
+# Server columns the rollup groups by; changing them also makes the rollup stale
+ROLLUP_SERVER_FIELDS = {"hoster", "country", "project"}
+
+rollup_state = {"dirty": True, "refreshed_at": 0.0}
+
+
+async def create_finance_rollup(conn):
+    for statement in FINANCE_ROLLUP_DDL:
+        await conn.execute(text(statement))
+
+
+def mark_finance_dirty():
+    # Called after finance (or server) writes; the next refresher tick rebuilds the rollup
+    rollup_state["dirty"] = True
+
+
+async def refresh_finance_rollup():
+    rollup_state["dirty"] = False
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY finance_monthly_spend"))
+    except Exception:
+        rollup_state["dirty"] = True
+        raise
+    rollup_state["refreshed_at"] = time.monotonic()
+
+
+async def refresh_finance_rollup_if_needed():
+    stale = time.monotonic() - rollup_state["refreshed_at"] >= FINANCE_ROLLUP_MAX_AGE
+    if rollup_state["dirty"] or stale:
+        await refresh_finance_rollup()
+
+
+finance_rollup_refresher = PeriodicTask(
+    "finance-rollup", FINANCE_ROLLUP_INTERVAL, refresh_finance_rollup_if_needed, initial_delay=1
+)
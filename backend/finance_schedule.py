@@ -0,0 +1,131 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, bindparam, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from background import PeriodicTask
+from cache import TTLCache
+from database import SessionLocal
+from finance_reports import mark_finance_dirty
+from models import Finance, AccountStatus
+from audit import history_row, record_history_bulk
+
+logger = logging.getLogger(__name__)
+
+FINANCE_UPCOMING_DAYS = int(os.getenv("FINANCE_UPCOMING_DAYS", "30"))
+FINANCE_UPCOMING_INTERVAL = float(os.getenv("FINANCE_UPCOMING_INTERVAL", "300"))  # 0 disables the job
+# Recurring payments this many days overdue are assumed paid and move to their next period
+FINANCE_ROLLOVER_GRACE_DAYS = int(os.getenv("FINANCE_ROLLOVER_GRACE_DAYS", "7"))
+FINANCE_ROLLOVER_BATCH_SIZE = int(os.getenv("FINANCE_ROLLOVER_BATCH_SIZE", "500"))
+FINANCE_ROLLOVER_MAX_BATCHES = int(os.getenv("FINANCE_ROLLOVER_MAX_BATCHES", "20"))
+
+# Upcoming payment lists per horizon (days); dropped on every finance write
+upcoming_cache = TTLCache(maxsize=32, ttl=FINANCE_UPCOMING_INTERVAL)
+
+
+def active_accounts(column=Finance.account_status):
+    # Rendered as a literal so the planner can match the ix_finance_active_payment_date predicate
+    return column == bindparam("active_status", AccountStatus.ACTIVE, type_=column.type, literal_execute=True)
+
+
+def invalidate_upcoming():
+    upcoming_cache.clear()
+
+
+async def load_upcoming(db: AsyncSession, days: int):
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        select(
+            Finance.id, Finance.server_id, Finance.group_id, Finance.price, Finance.currency,
+            Finance.payment_date, Finance.billing_period_months
+        )
+        .where(active_accounts(), Finance.payment_date < now + timedelta(days=days))
+        .order_by(Finance.payment_date, Finance.id)
+    )
+
+    # Grouped by (UTC day, currency); totals are never mixed across currencies
+    days_by_key = {}
+    for row in result.all():
+        payment = dict(row._mapping)
+        currency = payment.pop("currency").value
+        payment["overdue"] = payment["payment_date"] < now
+
+        key = (payment["payment_date"].astimezone(timezone.utc).date(), currency)
+        day = days_by_key.get(key)
+        if day is None:
+            day = days_by_key[key] = {
+                "day": key[0], "currency": currency, "total": 0.0, "count": 0, "overdue": False, "payments": []
+            }
+        day["total"] += payment["price"] or 0.0
+        day["count"] += 1
+        day["overdue"] = day["overdue"] or payment["overdue"]
+        day["payments"].append(payment)
+
+    return list(days_by_key.values())
+
+
+async def get_upcoming(db: AsyncSession, days: int):
+    upcoming = upcoming_cache.get(days)
+    if upcoming is None:
+        upcoming = await load_upcoming(db, days)
+        upcoming_cache.set(days, upcoming)
+    return upcoming
+
+
+async def roll_forward_payments():
+    # Moves overdue recurring payments to their next period, batch by batch, with a History row each
+    finance = Finance.__table__
+    old = finance.alias("old")
+    cutoff = datetime.now(timezone.utc) - timedelta(days=FINANCE_ROLLOVER_GRACE_DAYS)
+
+    rolled = 0
+    for _ in range(FINANCE_ROLLOVER_MAX_BATCHES):
+        async with SessionLocal() as db:
+            due = (
+                select(finance.c.id)
+                .where(
+                    active_accounts(finance.c.account_status),
+                    finance.c.billing_period_months.isnot(None),
+                    finance.c.payment_date < cutoff
+                )
+                .order_by(finance.c.payment_date)
+                .limit(FINANCE_ROLLOVER_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            result = await db.execute(
+                update(finance)
+                .where(finance.c.id == old.c.id, finance.c.id.in_(due.scalar_subquery()))
+                .values(
+                    payment_date=finance.c.payment_date + func.make_interval(0, finance.c.billing_period_months),
+                    updated_at=func.now()
+                )
+                .returning(finance.c.id, old.c.payment_date, finance.c.payment_date)
+            )
+            rows = result.all()
+            await record_history_bulk(db, [
+                history_row("UPDATE", "finance", finance_id, {"payment_date": {"old": old_date, "new": new_date}}, None)
+                for finance_id, old_date, new_date in rows
+            ])
+            await db.commit()
+
+        rolled += len(rows)
+        # Payments more than one period behind come back in the next batch
+        if not rows:
+            break
+
+    if rolled:
+        logger.info("Rolled %d recurring payment dates forward", rolled)
+        mark_finance_dirty()
+        invalidate_upcoming()
+    return rolled
+
+
+async def refresh_upcoming():
+    await roll_forward_payments()
+    async with SessionLocal() as db:
+        upcoming_cache.set(FINANCE_UPCOMING_DAYS, await load_upcoming(db, FINANCE_UPCOMING_DAYS))
+
+
+finance_scheduler = PeriodicTask("finance-upcoming", FINANCE_UPCOMING_INTERVAL, refresh_upcoming, initial_delay=2)
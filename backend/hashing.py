@@ -0,0 +1,62 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+class HashingPool:
+    # bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+    # while capping how many CPU-heavy hashes run at once.
+
+    def __init__(self, workers: int, queue_limit: int = 0):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+        self.pending = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    @property
+    def running(self):
+        return min(self.pending, self.workers)
+
+    @property
+    def queued(self):
+        return max(self.pending - self.workers, 0)
+
+    async def run(self, func, *args):
+        if self.queue_limit and self.queued >= self.queue_limit:
+            self.rejected += 1
+            raise HashingPoolFull()
+
+        self.pending += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += time.perf_counter() - started
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+        }
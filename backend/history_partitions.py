@@ -0,0 +1,167 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+
+from background import PeriodicTask
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+HISTORY_PARTITION_INTERVAL = float(os.getenv("HISTORY_PARTITION_INTERVAL", "21600"))  # 0 disables the job
+HISTORY_PARTITION_MONTHS_AHEAD = int(os.getenv("HISTORY_PARTITION_MONTHS_AHEAD", "3"))
+# Months of history kept in the database; older partitions are archived and dropped. 0 keeps everything.
+HISTORY_RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", "0"))
+HISTORY_ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", "/var/lib/controlnode/history-archive")
+HISTORY_ARCHIVE_BATCH_SIZE = 1000
+
+PARTITION_NAME = re.compile(r"^history_y(\d{4})m(\d{2})$")
+# Catches rows no monthly partition covers, so audited writes keep working if this job falls behind
+DEFAULT_PARTITION = "history_default"
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"history_y{month.year:04d}m{month.month:02d}"
+
+
+async def is_partitioned(conn) -> bool:
+    return bool(await conn.scalar(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('history')"
+    )))
+
+
+async def list_partitions(conn):
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('history')"
+    ))
+    partitions = {}
+    for name in result.scalars():
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+async def move_default_rows(conn, month: date):
+    # Creates the month's partition from the rows that landed in the default partition meanwhile.
+    # Only inserts into the default partition wait on the lock; other months keep being written.
+    name, start, end = partition_name(month), month.isoformat(), add_months(month, 1).isoformat()
+    await conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE"))
+    await conn.execute(text(f"CREATE TABLE {name} (LIKE history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    result = await conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= '{start}' AND timestamp < '{end}' "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+    ))
+    await conn.execute(text(f"ALTER TABLE history ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    logger.warning("Moved %d history rows from %s to %s", result.rowcount, DEFAULT_PARTITION, name)
+
+
+async def create_partitions(conn, first: date, last: date):
+    # One partition per month from `first` to `last` inclusive
+    month = first
+    while month <= last:
+        start, end = month.isoformat(), add_months(month, 1).isoformat()
+        if await conn.scalar(text(f"SELECT to_regclass('{partition_name(month)}') IS NULL")):
+            # A new range may not overlap rows already in the default partition
+            stranded = await conn.scalar(text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= '{start}' AND timestamp < '{end}')"
+            ))
+            if stranded:
+                await move_default_rows(conn, month)
+            else:
+                await conn.execute(text(
+                    f"CREATE TABLE {partition_name(month)} PARTITION OF history FOR VALUES FROM ('{start}') TO ('{end}')"
+                ))
+        month = add_months(month, 1)
+
+
+async def ensure_history_partitions():
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    async with engine.begin() as conn:
+        if not await is_partitioned(conn):
+            return
+        # Several workers run this job; only one creates partitions at a time
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('history_partitions'))"))
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF history DEFAULT"))
+        # Rows in the default partition mean this job fell behind; their months get partitions first
+        oldest = await conn.scalar(text(
+            f"SELECT date_trunc('month', min(timestamp) AT TIME ZONE 'UTC')::date FROM {DEFAULT_PARTITION}"
+        ))
+        await create_partitions(conn, min(current, oldest or current), add_months(current, HISTORY_PARTITION_MONTHS_AHEAD))
+
+
+def write_archive_chunk(archive, rows):
+    archive.write("".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows).encode())
+
+
+async def archive_partition(name: str):
+    # Streams the partition into <archive dir>/<partition>.jsonl.gz, written under a temporary name first
+    os.makedirs(HISTORY_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(HISTORY_ARCHIVE_DIR, f"{name}.jsonl.gz")
+    partial = f"{path}.partial"
+
+    archive = await asyncio.to_thread(gzip.open, partial, "wb")
+    archived = 0
+    try:
+        async with engine.connect() as conn:
+            result = await conn.stream(text(f"SELECT * FROM {name} ORDER BY id"))
+            async for rows in result.mappings().partitions(HISTORY_ARCHIVE_BATCH_SIZE):
+                await asyncio.to_thread(write_archive_chunk, archive, jsonable_encoder([dict(row) for row in rows]))
+                archived += len(rows)
+    finally:
+        await asyncio.to_thread(archive.close)
+
+    os.replace(partial, path)
+    return path, archived
+
+
+async def apply_history_retention():
+    if HISTORY_RETENTION_MONTHS <= 0:
+        return
+
+    cutoff = add_months(datetime.now(timezone.utc).date().replace(day=1), -HISTORY_RETENTION_MONTHS)
+    async with engine.connect() as lock_conn:
+        if not await is_partitioned(lock_conn):
+            return
+        # Session-level lock held while archiving, so only one worker archives a partition
+        if not await lock_conn.scalar(text("SELECT pg_try_advisory_lock(hashtext('history_retention'))")):
+            return
+
+        try:
+            partitions = await list_partitions(lock_conn)
+            await lock_conn.commit()
+
+            for month, name in sorted(partitions.items()):
+                if month >= cutoff:
+                    break
+
+                path, archived = await archive_partition(name)
+                async with engine.begin() as conn:
+                    await conn.execute(text(f"ALTER TABLE history DETACH PARTITION {name}"))
+                    await conn.execute(text(f"DROP TABLE {name}"))
+                logger.info("Archived %d history rows from %s to %s", archived, name, path)
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext('history_retention'))"))
+            await lock_conn.commit()
+
+
+async def maintain_history_partitions():
+    await ensure_history_partitions()
+    await apply_history_retention()
+
+
+history_partitioner = PeriodicTask(
+    "history-partitions", HISTORY_PARTITION_INTERVAL, maintain_history_partitions, initial_delay=30
+)
@@ -0,0 +1,42 @@
+import ipaddress
+import re
+from typing import List, Optional
+
+from sqlalchemy import and_, func
+
+_SEPARATORS = re.compile(r"[\s,;]+")
+
+
+def normalize_ip(value: str) -> Optional[str]:
+    # Plain addresses stay plain, "addr/prefix" is kept as an inet network value
+    value = value.strip()
+    try:
+        if "/" in value:
+            return str(ipaddress.ip_interface(value))
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+
+def parse_ip_list(text: Optional[str]) -> List[str]:
+    # additional_ips is free-form text; anything that is not an address or network is skipped
+    if not text:
+        return []
+
+    addresses = []
+    for token in _SEPARATORS.split(text):
+        address = normalize_ip(token) if token else None
+        if address and address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+def primary_address_match(primary, address):
+    # A server's primary address is a host even when stored with a prefix ("10.0.0.5/24" is 10.0.0.5):
+    # >>= narrows through the GiST inet_ops indexes, host equality decides
+    return and_(primary.op(">>=")(address), func.host(primary) == func.host(address))
+
+
+def network_address_match(network, address):
+    # Additional addresses may be whole networks, which cover every address inside them
+    return network.op(">>=")(address)
@@ -1,27 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
 
-from database import engine, get_db, Base
-from auth import authenticate_user, create_access_token, get_current_user, get_password_hash
+from database import (
+    engine, get_db, SessionLocal, Base, replicas, READ_PRIMARY_COOKIE, DB_READ_PRIMARY_AFTER_WRITE
+)
+from auth import authenticate_user, create_access_token, get_current_user, get_password_hash, hashing_pool
 from models import User, UserRole
 from schemas import LoginRequest, Token
+from pagination import NEXT_CURSOR_HEADER
+from dns_refresh import dns_refresher
+from finance_reports import create_finance_rollup, finance_rollup_refresher
+from finance_schedule import finance_scheduler
+from exchange_rates import load_rates_file
+from history_partitions import ensure_history_partitions, history_partitioner
+from events import events_listener
+from snapshots import entity_snapshotter
 import routers.servers
 import routers.domains
 import routers.users
 import routers.finance
 import routers.groups
 import routers.settings
+import routers.system
+import routers.history
+import routers.changes
+import routers.events
 
 load_dotenv()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(title="ControlNode API", version="1.0.0")
 
 # CORS configuration
@@ -31,8 +43,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+
+# Pin the client's reads to the primary for a moment after a write so it sees its own changes
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if replicas and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE, "1", max_age=DB_READ_PRIMARY_AFTER_WRITE, httponly=True, samesite="strict"
+        )
+    return response
+
+
 # Include routers
 app.include_router(routers.servers.router)
 app.include_router(routers.domains.router)
@@ -40,13 +65,17 @@ app.include_router(routers.users.router)
 app.include_router(routers.finance.router)
 app.include_router(routers.groups.router)
 app.include_router(routers.settings.router)
+app.include_router(routers.system.router)
+app.include_router(routers.history.router)
+app.include_router(routers.changes.router)
+app.include_router(routers.events.router)
 
 security = HTTPBearer()
 
 
 @app.post("/api/login", response_model=Token)
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = authenticate_user(db, login_data.username, login_data.password)
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, login_data.username, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -76,32 +105,65 @@ async def health_check():
     return {"status": "healthy"}
 
 
-# Create super admin on startup
+# Create tables and super admin on startup
 @app.on_event("startup")
 async def startup_event():
-    db = next(get_db())
+    async with engine.begin() as conn:
+        # Server search ranks matches with pg_trgm similarity()
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(Base.metadata.create_all)
+        await create_finance_rollup(conn)
+
+    async with SessionLocal() as db:
+        await create_super_admin(db)
+
+    # Current and upcoming monthly history partitions must exist before anything is audited
+    await ensure_history_partitions()
+    await load_rates_file()
+
+    dns_refresher.start()
+    finance_rollup_refresher.start()
+    finance_scheduler.start()
+    history_partitioner.start()
+    events_listener.start()
+    entity_snapshotter.start()
+
+
+async def create_super_admin(db: AsyncSession):
     try:
         # Check if super admin exists
-        super_admin = db.query(User).filter(User.username == "superadmin").first()
+        result = await db.execute(select(User).where(User.username == "superadmin"))
+        super_admin = result.scalars().first()
         if not super_admin:
             # Create super admin
             super_admin = User(
                 username="superadmin",
                 email="admin@controlnode.com",
                 phone_number="+380991234567",
-                password_hash=get_password_hash("Admin123!"),
+                password_hash=await get_password_hash("Admin123!"),
                 role=UserRole.SUPER_ADMIN,
                 status="active"
             )
             db.add(super_admin)
-            db.commit()
+            await db.commit()
             print("Super Admin created successfully")
         else:
             print("Super Admin already exists")
     except Exception as e:
         print(f"Error creating super admin: {e}")
-    finally:
-        db.close()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await dns_refresher.stop()
+    await finance_rollup_refresher.stop()
+    await finance_scheduler.stop()
+    await history_partitioner.stop()
+    await events_listener.stop()
+    await entity_snapshotter.stop()
+    await engine.dispose()
+    await replicas.dispose()
+    hashing_pool.shutdown()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,10 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, JSON, Enum as SQLEnum
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Boolean, DateTime, Date, Float, ForeignKey, Text, JSON, Index, UniqueConstraint,
+    Enum as SQLEnum
+)
+from sqlalchemy.dialects.postgresql import INET
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from datetime import datetime
 import enum
 from database import Base
@@ -52,6 +56,8 @@ class Currency(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    # Server-generated columns come back with the INSERT/UPDATE, no refresh round trip needed
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
@@ -73,15 +79,16 @@ class User(Base):
 
 class Server(Base):
     __tablename__ = "servers"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     os = Column(String(100))
-    ip_address = Column(String(45), nullable=False)
-    additional_ips = Column(Text)
+    ip_address = Column(INET, nullable=False)
+    additional_ips = Column(Text)  # Free-form; parsed addresses are kept in server_ips
     comments = Column(Text)
     hoster = Column(String(100))
     status = Column(SQLEnum(ServerStatus), default=ServerStatus.RUNNING)
-    group_id = Column(Integer, ForeignKey("groups.id"))
+    group_id = Column(Integer, ForeignKey("groups.id"), index=True)
     project = Column(String(100))
     country = Column(String(2))
 
@@ -101,13 +108,42 @@ class Server(Base):
     group = relationship("Group", back_populates="servers")
     finance_accounts = relationship("Finance", back_populates="server")
     history_entries = relationship("History", back_populates="server")
+    additional_ip_entries = relationship("ServerIP", back_populates="server", passive_deletes=True)
 
     creator = relationship("User", foreign_keys=[created_by])
     updater = relationship("User", foreign_keys=[updated_by])
 
+    __table_args__ = (
+        Index("ix_servers_ip_address_gist", "ip_address", postgresql_using="gist",
+              postgresql_ops={"ip_address": "inet_ops"}),
+        # Ranked ILIKE search (routers/servers.py); same indexes as alembic 002/003
+        Index("ix_servers_project_trgm", "project", postgresql_using="gin",
+              postgresql_ops={"project": "gin_trgm_ops"}),
+        Index("ix_servers_comments_trgm", "comments", postgresql_using="gin",
+              postgresql_ops={"comments": "gin_trgm_ops"}),
+        Index("ix_servers_ip_host_trgm", func.host(ip_address).label("ip_host"), postgresql_using="gin",
+              postgresql_ops={"ip_host": "gin_trgm_ops"}),
+    )
+
+
+class ServerIP(Base):
+    __tablename__ = "server_ips"
+
+    id = Column(Integer, primary_key=True, index=True)
+    server_id = Column(Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=False, index=True)
+    ip_address = Column(INET, nullable=False)
+
+    server = relationship("Server", back_populates="additional_ip_entries")
+
+    __table_args__ = (
+        Index("ix_server_ips_ip_address_gist", "ip_address", postgresql_using="gist",
+              postgresql_ops={"ip_address": "inet_ops"}),
+    )
+
 
 class Domain(Base):
     __tablename__ = "domains"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     domain_name = Column(String(255), unique=True, nullable=False)
@@ -117,6 +153,12 @@ class Domain(Base):
     a_records = Column(JSON)
     aaaa_records = Column(JSON)
 
+    # DNS refresh state, maintained by the background refresher
+    last_resolved_at = Column(DateTime(timezone=True), index=True)
+    resolution_error = Column(Text)
+    # Set while a refresher resolves the domain, so other workers skip it without holding row locks
+    resolve_lease_until = Column(DateTime(timezone=True))
+
     # Timestamps and user tracking
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -126,12 +168,31 @@ class Domain(Base):
     # Relationships
     group = relationship("Group", back_populates="domains")
     history_entries = relationship("History", back_populates="domain")
+    address_entries = relationship("DomainAddress", back_populates="domain", passive_deletes=True)
     creator = relationship("User", foreign_keys=[created_by])
     updater = relationship("User", foreign_keys=[updated_by])
 
 
+class DomainAddress(Base):
+    # Resolved A/AAAA addresses, joined against server addresses to map domains to servers
+    __tablename__ = "domain_addresses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain_id = Column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False, index=True)
+    ip_address = Column(INET, nullable=False)
+    record_type = Column(String(4), nullable=False)
+
+    domain = relationship("Domain", back_populates="address_entries")
+
+    __table_args__ = (
+        Index("ix_domain_addresses_ip_address_gist", "ip_address", postgresql_using="gist",
+              postgresql_ops={"ip_address": "inet_ops"}),
+    )
+
+
 class Group(Base):
     __tablename__ = "groups"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(100), nullable=False)
@@ -151,6 +212,7 @@ class Group(Base):
 
 class Finance(Base):
     __tablename__ = "finance"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     server_id = Column(Integer, ForeignKey("servers.id"))
@@ -159,6 +221,7 @@ class Finance(Base):
     currency = Column(SQLEnum(Currency), default=Currency.USD)
     payment_date = Column(DateTime(timezone=True))
     group_id = Column(Integer, ForeignKey("groups.id"))
+    billing_period_months = Column(Integer)  # None for one-off payments
 
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -169,17 +232,60 @@ class Finance(Base):
     group = relationship("Group", back_populates="finance_accounts")
     history_entries = relationship("History", back_populates="finance")
 
+    # Finance screen filters: date ranges, alone or per server / group / status
+    __table_args__ = (
+        Index("ix_finance_payment_date_id", "payment_date", "id"),
+        Index("ix_finance_server_id_payment_date", "server_id", "payment_date"),
+        Index("ix_finance_group_id_payment_date", "group_id", "payment_date"),
+        Index("ix_finance_account_status_payment_date", "account_status", "payment_date"),
+        # Upcoming / overdue payments only ever look at active accounts
+        Index("ix_finance_active_payment_date", "payment_date",
+              postgresql_where=(account_status == AccountStatus.ACTIVE)),
+    )
+
+
+class ExchangeRate(Base):
+    # Units of USD per one unit of currency, valid from rate_date until the next entry
+    __tablename__ = "exchange_rates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String(3), nullable=False)
+    rate_date = Column(Date, nullable=False)
+    rate_to_usd = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("currency", "rate_date", name="uq_exchange_rates_currency_rate_date"),
+    )
+
+
+class EntitySnapshot(Base):
+    # Full state of an audited row at taken_at; point-in-time reads replay History diffs from here
+    __tablename__ = "entity_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(50), nullable=False)
+    record_id = Column(Integer, nullable=False)
+    taken_at = Column(DateTime(timezone=True), nullable=False)
+    state = Column(JSON, nullable=False)
+
+    __table_args__ = (
+        Index("ix_entity_snapshots_entity_taken_at", "table_name", "record_id", "taken_at"),
+    )
+
 
 class History(Base):
     __tablename__ = "history"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Partitioned by month on timestamp (see history_partitions.py), so it is part of the key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     action = Column(String(50), nullable=False)  # CREATE, UPDATE, DELETE
     table_name = Column(String(50), nullable=False)
     record_id = Column(Integer, nullable=False)
     changes = Column(JSON)  # {"field": {"old": value, "new": value}}
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     user_id = Column(Integer, ForeignKey("users.id"))
+    # Id of the writing transaction; the /api/changes feed walks entries in commit-safe txid order
+    txid = Column(BigInteger, nullable=False, server_default=text("(pg_current_xact_id()::text)::bigint"))
 
     # Relationships to specific tables
     server_id = Column(Integer, ForeignKey("servers.id"), nullable=True)
@@ -191,6 +297,27 @@ class History(Base):
     domain = relationship("Domain", back_populates="history_entries")
     finance = relationship("Finance", back_populates="history_entries")
 
+    @property
+    def username(self):
+        # Needs `user` loaded up front (see audit.read_history); lazy loading is unavailable in async sessions
+        return self.user.username if self.user else None
+
+    __table_args__ = (
+        Index("ix_history_server_id_timestamp", "server_id", text("timestamp DESC")),
+        Index("ix_history_domain_id_timestamp", "domain_id", text("timestamp DESC")),
+        Index("ix_history_finance_id_timestamp", "finance_id", text("timestamp DESC")),
+        # Keysets of the /api/history feed and its filters
+        Index("ix_history_timestamp_id", text("timestamp DESC"), text("id DESC")),
+        Index("ix_history_table_name_record_id_timestamp", "table_name", "record_id", text("timestamp DESC")),
+        Index("ix_history_user_id_timestamp", "user_id", text("timestamp DESC")),
+        # Index-only scans for the /api/changes feed, which walks history by (txid, id)
+        Index(
+            "ix_history_txid_id_changes", "txid", "id",
+            postgresql_include=["table_name", "record_id", "action"]
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
 
 class Settings(Base):
     __tablename__ = "settings"
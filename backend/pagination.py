@@ -0,0 +1,73 @@
+import base64
+import json
+from datetime import datetime, date
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_, tuple_
+
+# List endpoints keep returning plain arrays; the cursor for the next page travels in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(values) -> str:
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = [_decode_value(value) for value in payload]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_filter(keys, values):
+    # keys is a list of (column, descending); rows strictly after `values` in that ordering
+    directions = {descending for _, descending in keys}
+    if len(directions) == 1:
+        columns = tuple_(*[column for column, _ in keys])
+        bound = tuple_(*values)
+        return columns < bound if directions.pop() else columns > bound
+
+    clauses = []
+    for index, (column, descending) in enumerate(keys):
+        equal = [keys[i][0] == values[i] for i in range(index)]
+        clauses.append(and_(*equal, column < values[index] if descending else column > values[index]))
+    return or_(*clauses)
+
+
+def paginate(query, keys, cursor: Optional[str] = None, skip: int = 0, limit: int = 100):
+    # Keyset pagination when a cursor is given, offset pagination (skip) for older clients
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in keys])
+    if cursor:
+        query = query.where(keyset_filter(keys, decode_cursor(cursor, len(keys))))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def set_next_cursor(response: Response, rows, limit: int, key):
+    if limit and len(rows) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
@@ -0,0 +1,153 @@
+import logging
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    def __init__(self, name: str, warn_ratio: float = 0.8, slow_checkout_ms: float = 100,
+                 log_interval: float = 60):
+        self.name = name
+        self.warn_ratio = warn_ratio
+        self.slow_checkout_ms = slow_checkout_ms
+        self.log_interval = log_interval
+        self.pool = None
+
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.checkout_total = 0.0
+        self.checkout_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+        self._last_summary = time.monotonic()
+        self._last_saturation_warning = 0.0
+
+    def pool_class(self):
+        # Subclass per engine so Pool.recreate() (used by dispose) keeps the metrics attached
+        return type("InstrumentedQueuePool", (InstrumentedQueuePool,), {"metrics": self})
+
+    def attach(self, engine):
+        self.pool = engine.pool
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def record_wait(self, seconds: float):
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        if seconds * 1000 >= self.slow_checkout_ms:
+            logger.warning(
+                "DB pool %s: waited %.1f ms for a connection (%s)",
+                self.name, seconds * 1000, self._status_line()
+            )
+
+    def record_timeout(self):
+        self.timeouts += 1
+        logger.error("DB pool %s: checkout timed out (%s)", self.name, self._status_line())
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        now = time.perf_counter()
+        self.checkouts += 1
+
+        started = connection_record.info.pop("checkout_started", None)
+        if started is not None:
+            latency = now - started
+            self.checkout_total += latency
+            self.checkout_max = max(self.checkout_max, latency)
+        connection_record.info["checked_out_at"] = now
+
+        self._maybe_warn_saturation()
+        self._maybe_log_summary()
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.checkins += 1
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            held = time.perf_counter() - checked_out_at
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+    def _capacity(self):
+        return self.pool.size() + max(self.pool._max_overflow, 0)
+
+    def _maybe_warn_saturation(self):
+        capacity = self._capacity()
+        if not capacity or self.pool.checkedout() < capacity * self.warn_ratio:
+            return
+        now = time.monotonic()
+        if now - self._last_saturation_warning >= 10:
+            self._last_saturation_warning = now
+            logger.warning("DB pool %s is near its limit (%s)", self.name, self._status_line())
+
+    def _maybe_log_summary(self):
+        if self.log_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_summary >= self.log_interval:
+            self._last_summary = now
+            logger.info("DB pool %s: %s", self.name, self._status_line())
+
+    def _status_line(self):
+        stats = self.snapshot()
+        return (
+            f"checked_out={stats['checked_out']}/{stats['capacity']} overflow={stats['overflow']} "
+            f"avg_wait_ms={stats['avg_wait_ms']} avg_checkout_ms={stats['avg_checkout_ms']} "
+            f"timeouts={stats['timeouts']}"
+        )
+
+    def snapshot(self):
+        checkouts = self.checkouts or 1
+        checkins = self.checkins or 1
+        return {
+            "name": self.name,
+            "size": self.pool.size(),
+            "max_overflow": self.pool._max_overflow,
+            "capacity": self._capacity(),
+            "checked_out": self.pool.checkedout(),
+            "checked_in": self.pool.checkedin(),
+            "overflow": max(self.pool.overflow(), 0),
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_total / checkouts * 1000, 3),
+            "max_wait_ms": round(self.wait_max * 1000, 3),
+            "avg_checkout_ms": round(self.checkout_total / checkouts * 1000, 3),
+            "max_checkout_ms": round(self.checkout_max * 1000, 3),
+            "avg_hold_ms": round(self.hold_total / checkins * 1000, 3),
+            "max_hold_ms": round(self.hold_max * 1000, 3),
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.pool = self
+        self.metrics.record_wait(time.perf_counter() - started)
+        # Picked up by the checkout event to include pre-ping in the checkout latency
+        record.info["checkout_started"] = started
+        return record
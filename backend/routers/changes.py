@@ -0,0 +1,132 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from sqlalchemy import select, cast, BigInteger, Text, func
+import os
+
+from database import get_db
+from pagination import encode_cursor, decode_cursor, keyset_filter
+from auth import get_current_user, check_permission
+from models import User, History, Server, Domain, Group, Finance
+from schemas import ChangesResponse
+from routers.groups import assigned_servers_count
+
+router = APIRouter(prefix="/api/changes", tags=["changes"])
+
+CHANGES_MAX_LIMIT = int(os.getenv("CHANGES_MAX_LIMIT", "5000"))
+
+CHANGE_TABLES = {"servers": Server, "domains": Domain, "groups": Group, "finance": Finance}
+
+# History ids are taken at insert but become visible at commit, so walking by id would skip an entry
+# whose transaction commits after a later id was already returned. The feed walks (txid, id) instead
+# and stops below the oldest transaction still running: everything under it has committed or never will.
+CHANGES_ORDER = [(History.txid, False), (History.id, False)]
+
+
+def visible_txid_bound():
+    return cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+
+
+def change_tables(user: User):
+    # Finance rows are only listed to the roles allowed to read /api/finance
+    if check_permission(user, "Admin 2L") or user.role.value == "Service Manager":
+        return list(CHANGE_TABLES)
+    return [table_name for table_name in CHANGE_TABLES if table_name != "finance"]
+
+
+async def head_cursor(db: AsyncSession, tables):
+    result = await db.execute(
+        select(History.txid, History.id)
+        .where(History.table_name.in_(tables), History.txid < visible_txid_bound())
+        .order_by(History.txid.desc(), History.id.desc())
+        .limit(1)
+    )
+    head = result.first()
+    return [head.txid, head.id] if head else [0, 0]
+
+
+async def change_entries(db: AsyncSession, tables, after, limit: int):
+    # Entries after the (txid, id) cursor, oldest first; the read runs on the primary, since a
+    # replica's snapshot bound says nothing about what the primary has committed since
+    result = await db.execute(
+        select(History.txid, History.id, History.table_name, History.record_id, History.action)
+        .where(
+            History.table_name.in_(tables),
+            keyset_filter(CHANGES_ORDER, after),
+            History.txid < visible_txid_bound()
+        )
+        .order_by(History.txid, History.id)
+        .limit(limit)
+    )
+    return result.all()
+
+
+def parse_cursor(since: str):
+    # [txid, id]; anything else would only fail later, inside the query
+    values = decode_cursor(since, 2)
+    if not all(type(value) is int and value >= 0 for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+async def load_rows(db: AsyncSession, table_name: str, ids):
+    model = CHANGE_TABLES[table_name]
+    if table_name == "groups":
+        result = await db.execute(select(Group, assigned_servers_count()).where(Group.id.in_(ids)))
+        groups = []
+        for group, assigned_servers in result.all():
+            group.assigned_servers = assigned_servers
+            groups.append(group)
+        return groups
+
+    result = await db.execute(select(model).where(model.id.in_(ids)))
+    return result.scalars().all()
+
+
+@router.get("/", response_model=ChangesResponse)
+async def get_changes(
+        since: Optional[str] = None,
+        limit: int = Query(1000, ge=1, le=CHANGES_MAX_LIMIT),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    tables = change_tables(current_user)
+
+    # Without `since`, only the current cursor: take it before downloading the full lists
+    if not since:
+        return {"cursor": encode_cursor(await head_cursor(db, tables))}
+
+    entries = await change_entries(db, tables, parse_cursor(since), limit + 1)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return {"cursor": since}
+
+    # One entry per row: created wins over updates, a delete wins over everything. Txid order is not
+    # commit order, so an update can come before the create it follows.
+    actions = {}
+    for entry in entries:
+        key = (entry.table_name, entry.record_id)
+        previous = actions.get(key)
+        if entry.action == "DELETE":
+            actions[key] = "deleted"
+        elif entry.action == "CREATE" and previous != "deleted":
+            actions[key] = "created"
+        elif previous is None:
+            actions[key] = "updated"
+
+    response = {"cursor": encode_cursor([entries[-1].txid, entries[-1].id]), "has_more": has_more, "changes": []}
+    for table_name in tables:
+        ids = [record_id for (table, record_id), action in actions.items() if table == table_name and action != "deleted"]
+        rows = await load_rows(db, table_name, ids) if ids else []
+        response[table_name] = rows
+
+        # Rows gone from the table were deleted, even if their DELETE entry is not on this page
+        found = {row.id for row in rows}
+        for (table, record_id), action in actions.items():
+            if table == table_name:
+                if action != "deleted" and record_id not in found:
+                    action = "deleted"
+                response["changes"].append({"table": table, "id": record_id, "action": action})
+
+    return response
@@ -1,137 +1,123 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
-import dns.resolver
+from sqlalchemy import select, String, union
 from datetime import datetime
+import os
 
-from database import get_db
+from database import get_db, get_read_db
+from pagination import paginate, set_next_cursor
 from auth import get_current_user, check_permission
-from models import User, Domain, History
-from schemas import DomainCreate, DomainUpdate, DomainResponse
+from models import User, Domain, DomainAddress, Server, ServerIP, History
+from schemas import DomainCreate, DomainUpdate, DomainResponse, DomainRefreshRequest, ServerResponse, HistoryResponse
+from dns_refresh import refresh_domain, refresh_domains
+from iputils import primary_address_match, network_address_match
+from audit import record_history, read_history
+from serialization import response_columns, rows_response
 
 router = APIRouter(prefix="/api/domains", tags=["domains"])
 
+# Upper bound on domains resolved by a single refresh request
+DNS_REFRESH_REQUEST_LIMIT = int(os.getenv("DNS_REFRESH_REQUEST_LIMIT", "1000"))
 
-def get_dns_records(domain: str):
-    try:
-        # Get NS records
-        ns_records = []
-        try:
-            answers = dns.resolver.resolve(domain, 'NS')
-            ns_records = [str(r.target) for r in answers]
-        except:
-            pass
-
-        # Get A records
-        a_records = []
-        try:
-            answers = dns.resolver.resolve(domain, 'A')
-            a_records = [str(r.address) for r in answers]
-        except:
-            pass
-
-        # Get AAAA records
-        aaaa_records = []
-        try:
-            answers = dns.resolver.resolve(domain, 'AAAA')
-            aaaa_records = [str(r.address) for r in answers]
-        except:
-            pass
-
-        return ns_records, a_records, aaaa_records
-    except Exception:
-        return [], [], []
+# The list endpoint selects plain rows of these columns rather than Domain objects
+DOMAIN_COLUMNS = response_columns(Domain, DomainResponse)
 
 
 @router.get("/", response_model=List[DomainResponse])
 async def get_domains(
+        response: Response,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
         search: Optional[str] = None,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Domain)
+    # DNS records are kept fresh by the background refresher, listing is a pure read
+    query = select(*DOMAIN_COLUMNS)
 
     if search:
         search = f"%{search}%"
-        query = query.filter(
+        query = query.where(
             (Domain.domain_name.ilike(search)) |
-            (Domain.group_id.cast(str).like(search))
+            (Domain.group_id.cast(String).like(search))
         )
 
-    domains = query.offset(skip).limit(limit).all()
+    result = await db.execute(paginate(query, [(Domain.id, False)], cursor, skip, limit))
+    domains = result.all()
+    set_next_cursor(response, domains, limit, lambda domain: [domain.id])
 
-    # Update DNS records for domains
-    for domain in domains:
-        if not domain.ns_records or not domain.a_records:
-            ns, a, aaaa = get_dns_records(domain.domain_name)
-            domain.ns_records = ns
-            domain.a_records = a
-            domain.aaaa_records = aaaa
-            db.add(domain)
-
-    db.commit()
-
-    return domains
+    return rows_response(response, domains)
 
 
 @router.post("/", response_model=DomainResponse)
 async def create_domain(
         domain: DomainCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
     # Check if domain exists
-    existing = db.query(Domain).filter(Domain.domain_name == domain.domain_name).first()
+    result = await db.execute(select(Domain).where(Domain.domain_name == domain.domain_name))
+    existing = result.scalars().first()
     if existing:
         raise HTTPException(status_code=400, detail="Domain already exists")
 
-    # Get DNS records
-    ns_records, a_records, aaaa_records = get_dns_records(domain.domain_name)
-
     db_domain = Domain(
         **domain.dict(),
-        ns_records=ns_records,
-        a_records=a_records,
-        aaaa_records=aaaa_records,
         created_by=current_user.id,
         updated_by=current_user.id
     )
-
     db.add(db_domain)
-    db.commit()
-    db.refresh(db_domain)
+    await db.flush()
 
-    # Log history
-    history = History(
-        action="CREATE",
-        table_name="domains",
-        record_id=db_domain.id,
-        changes={"all": "created"},
-        user_id=current_user.id,
-        domain_id=db_domain.id
-    )
-    db.add(history)
-    db.commit()
+    # Get DNS records
+    await refresh_domain(db, db_domain)
+    record_history(db, "CREATE", "domains", db_domain.id, {"all": "created"}, current_user.id)
+    await db.commit()
 
     return db_domain
 
 
+@router.post("/refresh", response_model=List[DomainResponse])
+async def refresh_domain_records(
+        request: DomainRefreshRequest,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 1L"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    if len(request.ids) > DNS_REFRESH_REQUEST_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {DNS_REFRESH_REQUEST_LIMIT} domains can be refreshed at once"
+        )
+
+    query = select(Domain).where(Domain.id.in_(request.ids)).order_by(Domain.id)
+    result = await db.execute(query)
+    await refresh_domains(db, result.scalars().all())
+    await db.commit()
+
+    # Reload in one query to pick up server-side updated_at values
+    result = await db.execute(query.execution_options(populate_existing=True))
+    return result.scalars().all()
+
+
 @router.put("/{domain_id}", response_model=DomainResponse)
 async def update_domain(
         domain_id: int,
         domain_update: DomainUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 1L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    db_domain = db.query(Domain).filter(Domain.id == domain_id).first()
+    db_domain = await db.get(Domain, domain_id)
     if not db_domain:
         raise HTTPException(status_code=404, detail="Domain not found")
 
@@ -149,42 +135,56 @@ async def update_domain(
 
     # Update DNS records if domain name changed
     if "domain_name" in update_data:
-        ns, a, aaaa = get_dns_records(db_domain.domain_name)
-        db_domain.ns_records = ns
-        db_domain.a_records = a
-        db_domain.aaaa_records = aaaa
+        await refresh_domain(db, db_domain)
 
     db.add(db_domain)
-    db.commit()
-    db.refresh(db_domain)
-
     # Log history
     if changes:
-        history = History(
-            action="UPDATE",
-            table_name="domains",
-            record_id=domain_id,
-            changes=changes,
-            user_id=current_user.id,
-            domain_id=domain_id
-        )
-        db.add(history)
-        db.commit()
+        record_history(db, "UPDATE", "domains", domain_id, changes, current_user.id)
+    await db.commit()
 
     return db_domain
 
 
-@router.get("/{domain_id}/history")
+@router.get("/{domain_id}/servers", response_model=List[ServerResponse])
+async def get_domain_servers(
+        domain_id: int,
+        response: Response,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+):
+    domain = await db.get(Domain, domain_id)
+    if not domain:
+        raise HTTPException(status_code=404, detail="Domain not found")
+
+    # Servers whose primary address is, or whose additional address/network covers, a resolved address;
+    # the same predicates as GET /api/servers/{id}/domains
+    addresses = select(DomainAddress.ip_address).where(DomainAddress.domain_id == domain_id).subquery()
+    server_ids = union(
+        select(Server.id).join(addresses, primary_address_match(Server.ip_address, addresses.c.ip_address)),
+        select(ServerIP.server_id).join(addresses, network_address_match(ServerIP.ip_address, addresses.c.ip_address))
+    )
+    query = select(Server).where(Server.id.in_(server_ids))
+
+    result = await db.execute(paginate(query, [(Server.id, False)], cursor, 0, limit))
+    servers = result.scalars().all()
+    set_next_cursor(response, servers, limit, lambda server: [server.id])
+
+    return servers
+
+
+@router.get("/{domain_id}/history", response_model=List[HistoryResponse])
 async def get_domain_history(
         domain_id: int,
-        db: Session = Depends(get_db),
+        response: Response,
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 1L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    history = db.query(History).filter(
-        History.domain_id == domain_id
-    ).order_by(History.timestamp.desc()).all()
-
-    return history
\ No newline at end of file
+    return await read_history(db, response, [History.domain_id == domain_id], cursor, limit)
\ No newline at end of file
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, WebSocket, status
+from typing import Optional
+import asyncio
+import json
+
+from database import SessionLocal
+from auth import user_from_token
+from events import event_hub, Subscriber
+from routers.changes import change_tables
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# Close code for evicted slow clients: reconnect, then resync through /api/changes
+SLOW_CONSUMER_CLOSE_CODE = status.WS_1013_TRY_AGAIN_LATER
+
+
+def parse_tables(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return [table.strip() for table in value or [] if table.strip()]
+
+
+def allowed_tables(user, requested):
+    # The tables /api/changes lists to this user (finance needs Admin 2L or Service Manager);
+    # without a filter, all of those
+    allowed = change_tables(user)
+    refused = [table for table in requested if table not in allowed]
+    if refused:
+        raise PermissionError(f"Cannot follow: {', '.join(refused)}")
+    return requested or allowed
+
+
+def parse_groups(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return [int(group) for group in value or [] if str(group).strip()]
+
+
+async def send_events(websocket: WebSocket, subscriber: Subscriber):
+    while True:
+        item = await subscriber.queue.get()
+        if item is None:
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Too far behind, resync required")
+            return
+        await websocket.send_json(item)
+
+
+async def receive_filters(websocket: WebSocket, subscriber: Subscriber, user):
+    # Clients may replace their filters at any time: {"tables": [...], "groups": [...]}
+    while True:
+        message = await websocket.receive_text()
+        try:
+            filters = json.loads(message)
+            tables = allowed_tables(user, parse_tables(filters.get("tables")))
+            subscriber.set_filters(tables, parse_groups(filters.get("groups")))
+        except PermissionError as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+        except (ValueError, TypeError, AttributeError):
+            await websocket.send_json({"type": "error", "detail": "Invalid filter message"})
+
+
+@router.websocket("/ws")
+async def events_socket(
+        websocket: WebSocket,
+        token: str = "",
+        tables: Optional[str] = None,
+        groups: Optional[str] = None
+):
+    # Browsers cannot set headers on WebSockets, so the access token comes as a query parameter
+    async with SessionLocal() as db:
+        user = await user_from_token(db, token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    try:
+        subscriber = event_hub.subscribe(allowed_tables(user, parse_tables(tables)), parse_groups(groups))
+    except PermissionError as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
+        return
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid group filter")
+        return
+
+    await websocket.accept()
+    sender = asyncio.create_task(send_events(websocket, subscriber))
+    receiver = asyncio.create_task(receive_filters(websocket, subscriber, user))
+    try:
+        # Either side ending (disconnect, eviction, send failure) ends the connection
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+        event_hub.unsubscribe(subscriber)
@@ -1,73 +1,293 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Optional, List
-from datetime import datetime
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Literal
+from datetime import datetime, date, timedelta, timezone
+from sqlalchemy import select, func, or_, cast, Date, String
+import re
 
-from database import get_db
+from database import get_db, get_read_db
+from pagination import paginate, set_next_cursor
 from auth import get_current_user, check_permission
-from models import User, Finance, Server, AccountStatus, History
-from schemas import FinanceCreate, FinanceUpdate, FinanceResponse
+from models import User, Finance, Server, AccountStatus, Currency, ExchangeRate, History
+from schemas import (
+    FinanceCreate, FinanceUpdate, FinanceResponse, SpendReportRow, UpcomingPaymentDay, ExchangeRateBase,
+    ExchangeRateResponse, HistoryResponse
+)
+from finance_reports import finance_monthly_spend, mark_finance_dirty
+from finance_schedule import get_upcoming, invalidate_upcoming
+from exchange_rates import convert, convert_amount, upsert_rates
+from audit import record_history, read_history
 
 router = APIRouter(prefix="/api/finance", tags=["finance"])
 
+DATE_SEARCH = re.compile(r"^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?$")
+DATE_ONLY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def payment_date_range(search: str):
+    # "2026", "2026-03" or "2026-03-15" -> [start, end) of that year, month or day
+    match = DATE_SEARCH.match(search)
+    if not match:
+        return None
+
+    year, month, day = match.groups()
+    try:
+        start = datetime(int(year), int(month or 1), int(day or 1), tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+    if day:
+        end = start + timedelta(days=1)
+    elif month:
+        end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    else:
+        end = start.replace(year=start.year + 1)
+    return start, end
+
+
+def finance_search_filter(search: str):
+    # Exact id lookups and payment date ranges, both served by indexes; "2026" can be either
+    search = search.strip()
+    conditions = []
+    if search.isdigit():
+        value = int(search)
+        conditions += [Finance.id == value, Finance.server_id == value, Finance.group_id == value]
+    date_range = payment_date_range(search)
+    if date_range:
+        start, end = date_range
+        conditions.append((Finance.payment_date >= start) & (Finance.payment_date < end))
+    if not conditions:
+        # Any other term keeps the substring match over the same fields
+        pattern = f"%{search}%"
+        conditions = [
+            Finance.id.cast(String).ilike(pattern),
+            Finance.server_id.cast(String).ilike(pattern),
+            Finance.group_id.cast(String).ilike(pattern),
+            func.to_char(Finance.payment_date, 'YYYY-MM-DD').ilike(pattern),
+        ]
+    return or_(*conditions)
+
+
+def day_start(value: date) -> datetime:
+    return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+
+
+def parse_payment_date(value: str, name: str):
+    # (datetime, date_only). A bare "2026-03-15" is told apart explicitly, since pydantic would also
+    # accept it as a datetime at midnight; timestamps without an offset are UTC
+    value = value.strip()
+    try:
+        if DATE_ONLY.match(value):
+            return day_start(date.fromisoformat(value)), True
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a date or a date and time")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed, False
+
 
 @router.get("/", response_model=List[FinanceResponse])
 async def get_finance_accounts(
+        response: Response,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
         search: Optional[str] = None,
-        db: Session = Depends(get_db),
+        payment_date_from: Optional[str] = None,
+        payment_date_to: Optional[str] = None,
+        status: Optional[AccountStatus] = None,
+        currency: Optional[Currency] = None,
+        group_id: Optional[int] = None,
+        server_id: Optional[int] = None,
+        price_min: Optional[float] = None,
+        price_max: Optional[float] = None,
+        base_currency: Optional[Currency] = None,
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L") and current_user.role.value != "Service Manager":
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    query = db.query(Finance).join(Server, Finance.server_id == Server.id)
+    query = select(Finance)
+    if base_currency:
+        # Converted in the same query at the rate in effect on the payment date
+        query = query.add_columns(convert(
+            Finance.price, Finance.currency.cast(String), cast(Finance.payment_date, Date), base_currency.value
+        ).label("price_normalized"))
 
     if search:
-        search = f"%{search}%"
-        query = query.filter(
-            (Finance.id.cast(str).like(search)) |
-            (Server.id.cast(str).like(search)) |
-            (func.to_char(Finance.payment_date, 'YYYY-MM-DD').like(search)) |
-            (Server.group_id.cast(str).like(search))
+        query = query.where(finance_search_filter(search))
+    # A date without a time covers that whole (UTC) day on either end
+    if payment_date_from:
+        start, _ = parse_payment_date(payment_date_from, "payment_date_from")
+        query = query.where(Finance.payment_date >= start)
+    if payment_date_to:
+        end, date_only = parse_payment_date(payment_date_to, "payment_date_to")
+        if date_only:
+            query = query.where(Finance.payment_date < end + timedelta(days=1))
+        else:
+            query = query.where(Finance.payment_date <= end)
+    if status:
+        query = query.where(Finance.account_status == status)
+    if currency:
+        query = query.where(Finance.currency == currency)
+    if group_id is not None:
+        # Accounts of the group, or of servers in the group
+        query = query.where(or_(
+            Finance.group_id == group_id,
+            Finance.server_id.in_(select(Server.id).where(Server.group_id == group_id))
+        ))
+    if server_id is not None:
+        query = query.where(Finance.server_id == server_id)
+    if price_min is not None:
+        query = query.where(Finance.price >= price_min)
+    if price_max is not None:
+        query = query.where(Finance.price <= price_max)
+
+    result = await db.execute(paginate(query, [(Finance.id, False)], cursor, skip, limit))
+    if base_currency:
+        accounts = []
+        for account, price_normalized in result.all():
+            account.price_normalized = price_normalized
+            accounts.append(account)
+    else:
+        accounts = result.scalars().all()
+    set_next_cursor(response, accounts, limit, lambda account: [account.id])
+
+    return accounts
+
+
+@router.get("/upcoming", response_model=List[UpcomingPaymentDay])
+async def get_upcoming_payments(
+        days: int = Query(30, ge=1, le=366),
+        base_currency: Optional[Currency] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 2L") and current_user.role.value != "Service Manager":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    # Overdue and upcoming payments of active accounts, grouped by day and currency
+    upcoming = await get_upcoming(db, days)
+    if not base_currency:
+        return upcoming
+
+    # The cached list is shared, so normalized totals go on copies
+    return [
+        {**day, "total_normalized": await convert_amount(
+            db, day["total"], day["currency"], day["day"], base_currency.value
+        )}
+        for day in upcoming
+    ]
+
+
+@router.get("/reports/spend", response_model=List[SpendReportRow], response_model_exclude_unset=True)
+async def get_spend_report(
+        group_by: List[Literal["month", "group_id", "hoster", "country", "project", "currency"]] = Query(["month"]),
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        group_id: Optional[int] = None,
+        currency: Optional[Currency] = None,
+        base_currency: Optional[Currency] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 2L") and current_user.role.value != "Service Manager":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    spend = finance_monthly_spend.c
+    dimensions = list(dict.fromkeys(group_by))
+    aggregates = [func.sum(spend.accounts).label("accounts")]
+    if base_currency:
+        # Each monthly bucket converts at the rate in effect on the first day of the month
+        aggregates.append(
+            func.sum(convert(spend.total, spend.currency, spend.month, base_currency.value)).label("total_normalized")
         )
+    else:
+        # Amounts in different currencies are never added up
+        dimensions = list(dict.fromkeys(dimensions + ["currency"]))
+    if "currency" in dimensions:
+        aggregates.append(func.sum(spend.total).label("total"))
+
+    columns = [spend[name] for name in dimensions]
+    query = select(*columns, *aggregates).group_by(*columns).order_by(*columns)
+
+    # The rollup is monthly, so the range covers whole months
+    if date_from:
+        query = query.where(spend.month >= date_from.replace(day=1))
+    if date_to:
+        query = query.where(spend.month <= date_to)
+    if group_id is not None:
+        query = query.where(spend.group_id == group_id)
+    if currency:
+        query = query.where(spend.currency == currency.value)
+
+    result = await db.execute(query)
+    return [SpendReportRow(**row) for row in result.mappings()]
+
+
+@router.get("/exchange-rates", response_model=List[ExchangeRateResponse])
+async def get_exchange_rates(
+        currency: Optional[Currency] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 2L") and current_user.role.value != "Service Manager":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    query = select(ExchangeRate)
+    if currency:
+        query = query.where(ExchangeRate.currency == currency.value)
+    if date_from:
+        query = query.where(ExchangeRate.rate_date >= date_from)
+    if date_to:
+        query = query.where(ExchangeRate.rate_date <= date_to)
 
-    return query.offset(skip).limit(limit).all()
+    result = await db.execute(query.order_by(ExchangeRate.currency, ExchangeRate.rate_date))
+    return result.scalars().all()
+
+
+@router.put("/exchange-rates")
+async def update_exchange_rates(
+        rates: List[ExchangeRateBase],
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 2L"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    # Upserts by (currency, rate_date)
+    await upsert_rates(db, [{**rate.dict(), "currency": rate.currency.value} for rate in rates])
+    await db.commit()
+
+    return {"updated": len(rates)}
 
 
 @router.post("/", response_model=FinanceResponse)
 async def create_finance_account(
         finance: FinanceCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L") and current_user.role.value != "Service Manager":
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
     # Check if server exists
-    server = db.query(Server).filter(Server.id == finance.server_id).first()
+    server = await db.get(Server, finance.server_id)
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
 
     db_finance = Finance(**finance.dict())
 
     db.add(db_finance)
-    db.commit()
-    db.refresh(db_finance)
-
-    # Log history
-    history = History(
-        action="CREATE",
-        table_name="finance",
-        record_id=db_finance.id,
-        changes={"all": "created"},
-        user_id=current_user.id,
-        finance_id=db_finance.id
-    )
-    db.add(history)
-    db.commit()
+    await db.flush()
+    record_history(db, "CREATE", "finance", db_finance.id, {"all": "created"}, current_user.id)
+    await db.commit()
+    mark_finance_dirty()
+    invalidate_upcoming()
 
     return db_finance
 
@@ -76,13 +296,13 @@ async def create_finance_account(
 async def update_finance_account(
         finance_id: int,
         finance_update: FinanceUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L") and current_user.role.value != "Service Manager":
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    db_finance = db.query(Finance).filter(Finance.id == finance_id).first()
+    db_finance = await db.get(Finance, finance_id)
     if not db_finance:
         raise HTTPException(status_code=404, detail="Finance account not found")
 
@@ -98,36 +318,26 @@ async def update_finance_account(
     db_finance.updated_at = datetime.utcnow()
 
     db.add(db_finance)
-    db.commit()
-    db.refresh(db_finance)
-
     # Log history
     if changes:
-        history = History(
-            action="UPDATE",
-            table_name="finance",
-            record_id=finance_id,
-            changes=changes,
-            user_id=current_user.id,
-            finance_id=finance_id
-        )
-        db.add(history)
-        db.commit()
+        record_history(db, "UPDATE", "finance", finance_id, changes, current_user.id)
+    await db.commit()
+    mark_finance_dirty()
+    invalidate_upcoming()
 
     return db_finance
 
 
-@router.get("/{finance_id}/history")
+@router.get("/{finance_id}/history", response_model=List[HistoryResponse])
 async def get_finance_history(
         finance_id: int,
-        db: Session = Depends(get_db),
+        response: Response,
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 1L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    history = db.query(History).filter(
-        History.finance_id == finance_id
-    ).order_by(History.timestamp.desc()).all()
-
-    return history
\ No newline at end of file
+    return await read_history(db, response, [History.finance_id == finance_id], cursor, limit)
\ No newline at end of file
@@ -1,42 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import select, func, String
 
-from database import get_db
+from database import get_db, get_read_db
+from pagination import paginate, set_next_cursor
 from auth import get_current_user, check_permission
-from models import User, Group, Server, GroupStatus, History
+from models import User, Group, Server, GroupStatus
 from schemas import GroupCreate, GroupUpdate, GroupResponse
+from audit import record_history
 
 router = APIRouter(prefix="/api/groups", tags=["groups"])
 
 
+def assigned_servers_count():
+    # Correlated count, evaluated only for the rows that end up on the page (ix_servers_group_id)
+    return (
+        select(func.count(Server.id))
+        .where(Server.group_id == Group.id)
+        .correlate(Group)
+        .scalar_subquery()
+        .label("assigned_servers")
+    )
+
+
 @router.get("/", response_model=List[GroupResponse])
 async def get_groups(
+        response: Response,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
         search: Optional[str] = None,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Group)
+    query = select(Group, assigned_servers_count())
 
     if search:
         search = f"%{search}%"
-        query = query.filter(
-            (Group.id.cast(str).like(search)) |
+        query = query.where(
+            (Group.id.cast(String).like(search)) |
             (Group.title.ilike(search))
         )
 
-    groups = query.offset(skip).limit(limit).all()
-
-    # Calculate assigned servers for each group
-    for group in groups:
-        server_count = db.query(func.count(Server.id)).filter(
-            Server.group_id == group.id
-        ).scalar()
-        group.assigned_servers = server_count
+    result = await db.execute(paginate(query, [(Group.id, False)], cursor, skip, limit))
+    groups = []
+    for group, assigned_servers in result.all():
+        group.assigned_servers = assigned_servers
+        groups.append(group)
+    set_next_cursor(response, groups, limit, lambda group: [group.id])
 
     return groups
 
@@ -44,7 +57,7 @@ async def get_groups(
 @router.post("/", response_model=GroupResponse)
 async def create_group(
         group: GroupCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L"):
@@ -53,19 +66,9 @@ async def create_group(
     db_group = Group(**group.dict())
 
     db.add(db_group)
-    db.commit()
-    db.refresh(db_group)
-
-    # Log history
-    history = History(
-        action="CREATE",
-        table_name="groups",
-        record_id=db_group.id,
-        changes={"all": "created"},
-        user_id=current_user.id
-    )
-    db.add(history)
-    db.commit()
+    await db.flush()
+    record_history(db, "CREATE", "groups", db_group.id, {"all": "created"}, current_user.id)
+    await db.commit()
 
     return db_group
 
@@ -74,13 +77,13 @@ async def create_group(
 async def update_group(
         group_id: int,
         group_update: GroupUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    db_group = db.query(Group).filter(Group.id == group_id).first()
+    db_group = await db.get(Group, group_id)
     if not db_group:
         raise HTTPException(status_code=404, detail="Group not found")
 
@@ -96,19 +99,10 @@ async def update_group(
     db_group.updated_at = datetime.utcnow()
 
     db.add(db_group)
-    db.commit()
-    db.refresh(db_group)
-
     # Log history
     if changes:
-        history = History(
-            action="UPDATE",
-            table_name="groups",
-            record_id=group_id,
-            changes=changes,
-            user_id=current_user.id
-        )
-        db.add(history)
-        db.commit()
+        record_history(db, "UPDATE", "groups", group_id, changes, current_user.id)
+    await db.commit()
+    db_group.assigned_servers = await db.scalar(select(func.count(Server.id)).where(Server.group_id == group_id))
 
     return db_group
\ No newline at end of file
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List
+from datetime import datetime, timezone
+
+from database import get_read_db
+from auth import get_current_user, check_permission
+from audit import read_history
+from snapshots import SNAPSHOT_TABLES, state_as_of, retained_history_start
+from models import User, History
+from schemas import HistoryResponse, EntityStateResponse
+
+router = APIRouter(prefix="/api/history", tags=["history"])
+
+
+@router.get("/", response_model=List[HistoryResponse])
+async def get_history(
+        response: Response,
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = None,
+        table_name: Optional[str] = None,
+        action: Optional[str] = None,
+        user_id: Optional[int] = None,
+        record_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 1L"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    conditions = []
+    if table_name:
+        conditions.append(History.table_name == table_name)
+    if action:
+        conditions.append(History.action == action.upper())
+    if user_id is not None:
+        conditions.append(History.user_id == user_id)
+    if record_id is not None:
+        conditions.append(History.record_id == record_id)
+    if since:
+        conditions.append(History.timestamp >= since)
+    if until:
+        conditions.append(History.timestamp < until)
+
+    return await read_history(db, response, conditions, cursor, limit)
+
+
+@router.get("/as-of", response_model=EntityStateResponse)
+async def get_state_as_of(
+        table_name: str,
+        record_id: int,
+        at: datetime,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 1L"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if table_name not in SNAPSHOT_TABLES:
+        raise HTTPException(status_code=400, detail=f"table_name must be one of: {', '.join(SNAPSHOT_TABLES)}")
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+
+    history_start = await retained_history_start(db)
+    if history_start is not None and at < history_start:
+        raise HTTPException(
+            status_code=410, detail=f"History before {history_start.date().isoformat()} has been archived"
+        )
+
+    replayed = await state_as_of(db, table_name, record_id, at, history_start)
+    if replayed is None or replayed["state"] is None:
+        raise HTTPException(status_code=404, detail="Record did not exist at that time")
+
+    return {"table_name": table_name, "record_id": record_id, "at": at, **replayed}
@@ -1,54 +1,217 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy import select, func, cast, delete, insert, update, and_, or_, union, false
+from sqlalchemy.dialects.postgresql import INET, CIDR
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Literal
+import ipaddress
+import os
 from datetime import datetime
 
-from database import get_db
+from database import get_db, get_read_db
+from pagination import paginate, set_next_cursor
 from auth import get_current_user, check_permission
-from models import User, Server, ServerStatus, History
-from schemas import ServerCreate, ServerUpdate, ServerResponse, SearchRequest
+from models import User, Server, ServerIP, ServerStatus, History, Group, Domain, DomainAddress
+from schemas import (
+    ServerCreate, ServerUpdate, ServerResponse, SearchRequest, IPLookupMatch, BulkImportResult, BulkRowError,
+    ServerBulkUpdate, ServerBulkUpdateResult, DomainResponse, HistoryResponse
+)
+from bulk_import import iter_csv_records, iter_ndjson_records
+from iputils import normalize_ip, parse_ip_list, primary_address_match, network_address_match
+from finance_reports import ROLLUP_SERVER_FIELDS, mark_finance_dirty
+from audit import history_row, record_history, record_history_bulk, read_history
+from serialization import response_columns, rows_response
 
 router = APIRouter(prefix="/api/servers", tags=["servers"])
 
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "500"))
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "1000"))
+
+# The list endpoint selects plain rows of these columns rather than Server objects
+SERVER_COLUMNS = response_columns(Server, ServerResponse)
+
+
+def like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def ip_match(column, mode: str, value: str):
+    # For additional addresses, which may be whole networks.
+    # All three operators are served by the GiST inet_ops indexes
+    if mode == "within":
+        network = str(ipaddress.ip_network(value, strict=False))
+        return column.op("<<=")(cast(network, CIDR))
+    if mode == "contains":
+        return column.op(">>=")(cast(value, INET))
+    return column == cast(value, INET)
+
+
+def primary_ip_match(mode: str, value: str):
+    # The primary address is a host even when stored with a prefix ("10.0.0.5/24" is 10.0.0.5),
+    # so it is compared by host; && and >>= keep the GiST index in play
+    if mode == "within":
+        network = cast(str(ipaddress.ip_network(value, strict=False)), CIDR)
+        return and_(Server.ip_address.op("&&")(network), cast(func.host(Server.ip_address), INET).op("<<=")(network))
+    interface = ipaddress.ip_interface(value)
+    if mode == "contains" and interface.network.prefixlen < interface.max_prefixlen:
+        # A single host never contains a wider network
+        return false()
+    return primary_address_match(Server.ip_address, cast(str(interface.ip), INET))
+
+
+def server_ip_match(mode: str, value: str):
+    # Matches a server by its primary address or any of its additional addresses
+    return primary_ip_match(mode, value) | Server.id.in_(
+        select(ServerIP.server_id).where(ip_match(ServerIP.ip_address, mode, value))
+    )
+
+
+async def replace_additional_ips(db: AsyncSession, server_id: int, additional_ips: Optional[str]):
+    await db.execute(delete(ServerIP).where(ServerIP.server_id == server_id))
+    addresses = parse_ip_list(additional_ips)
+    if addresses:
+        await db.execute(
+            insert(ServerIP),
+            [{"server_id": server_id, "ip_address": address} for address in addresses]
+        )
+
 
 @router.get("/", response_model=List[ServerResponse])
 async def get_servers(
+        response: Response,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
         search: Optional[str] = None,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Server)
-
-    if search:
-        search = f"%{search}%"
-        query = query.filter(
-            (Server.id.cast(str).like(search)) |
-            (Server.project.ilike(search)) |
-            (Server.ip_address.ilike(search)) |
-            (Server.comments.ilike(search))
-        )
+    search = search.strip() if search else None
+
+    # Numeric input is a server ID lookup
+    if search and search.isdigit():
+        result = await db.execute(select(*SERVER_COLUMNS).where(Server.id == int(search)))
+        return rows_response(response, result.all())
+
+    # An address or CIDR block returns the servers inside it
+    if search and normalize_ip(search):
+        query = select(*SERVER_COLUMNS).where(server_ip_match("within", search))
+        result = await db.execute(paginate(query, [(Server.id, False)], cursor, skip, limit))
+        servers = result.all()
+        set_next_cursor(response, servers, limit, lambda server: [server.id])
+        return rows_response(response, servers)
+
+    if not search:
+        result = await db.execute(paginate(select(*SERVER_COLUMNS), [(Server.id, False)], cursor, skip, limit))
+        servers = result.all()
+        set_next_cursor(response, servers, limit, lambda server: [server.id])
+        return rows_response(response, servers)
+
+    # ILIKE filters are served by the pg_trgm GIN indexes, matches are ranked by trigram similarity
+    pattern = like_pattern(search)
+    rank = func.greatest(
+        func.similarity(Server.project, search),
+        func.similarity(func.host(Server.ip_address), search),
+        func.word_similarity(search, Server.comments),
+    ).label("rank")
+    query = select(*SERVER_COLUMNS, rank).where(
+        Server.project.ilike(pattern, escape="\\") |
+        func.host(Server.ip_address).ilike(pattern, escape="\\") |
+        Server.comments.ilike(pattern, escape="\\")
+    )
+
+    result = await db.execute(paginate(query, [(rank, True), (Server.id, False)], cursor, skip, limit))
+    rows = result.all()
+    set_next_cursor(response, rows, limit, lambda row: [row.rank, row.id])
 
-    return query.offset(skip).limit(limit).all()
+    return rows_response(response, rows, exclude=("rank",))
+
+
+@router.get("/ip-lookup", response_model=List[IPLookupMatch])
+async def lookup_servers_by_ip(
+        ip: str,
+        mode: Literal["exact", "within", "contains"] = "exact",
+        limit: int = 100,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+):
+    # exact: address equals ip; within: address inside the ip/CIDR block;
+    # contains: a stored network contains ip (reverse lookup of an owner). Primary addresses are hosts.
+    if normalize_ip(ip) is None:
+        raise HTTPException(status_code=400, detail="Invalid IP address or network")
+
+    primary = await db.execute(
+        select(Server).where(primary_ip_match(mode, ip)).order_by(Server.id).limit(limit)
+    )
+    additional = await db.execute(
+        select(Server, ServerIP.ip_address)
+        .join(ServerIP, ServerIP.server_id == Server.id)
+        .where(ip_match(ServerIP.ip_address, mode, ip))
+        .order_by(Server.id)
+        .limit(limit)
+    )
+
+    matches = [
+        {"matched_ip": str(server.ip_address), "source": "primary", "server": server}
+        for server in primary.scalars().all()
+    ]
+    matches += [
+        {"matched_ip": str(matched_ip), "source": "additional", "server": server}
+        for server, matched_ip in additional.all()
+    ]
+    return matches[:limit]
 
 
 @router.get("/{server_id}", response_model=ServerResponse)
 async def get_server(
         server_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
-    server = db.query(Server).filter(Server.id == server_id).first()
+    server = await db.get(Server, server_id)
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
     return server
 
 
+@router.get("/{server_id}/domains", response_model=List[DomainResponse])
+async def get_server_domains(
+        server_id: int,
+        response: Response,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+):
+    server = await db.get(Server, server_id)
+    if not server:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    # Domains resolving to the primary address or into any additional address/network;
+    # the same predicates as GET /api/domains/{id}/servers
+    domain_ids = union(
+        select(DomainAddress.domain_id)
+        .join(Server, primary_address_match(Server.ip_address, DomainAddress.ip_address))
+        .where(Server.id == server_id),
+        select(DomainAddress.domain_id)
+        .join(ServerIP, network_address_match(ServerIP.ip_address, DomainAddress.ip_address))
+        .where(ServerIP.server_id == server_id)
+    )
+    query = select(Domain).where(Domain.id.in_(domain_ids))
+
+    result = await db.execute(paginate(query, [(Domain.id, False)], cursor, 0, limit))
+    domains = result.scalars().all()
+    set_next_cursor(response, domains, limit, lambda domain: [domain.id])
+
+    return domains
+
+
 @router.post("/", response_model=ServerResponse)
 async def create_server(
         server: ServerCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L"):
@@ -61,35 +224,198 @@ async def create_server(
     )
 
     db.add(db_server)
-    db.commit()
-    db.refresh(db_server)
-
-    # Log history
-    history = History(
-        action="CREATE",
-        table_name="servers",
-        record_id=db_server.id,
-        changes={"all": "created"},
-        user_id=current_user.id,
-        server_id=db_server.id
-    )
-    db.add(history)
-    db.commit()
+    await db.flush()
+    await replace_additional_ips(db, db_server.id, db_server.additional_ips)
+    record_history(db, "CREATE", "servers", db_server.id, {"all": "created"}, current_user.id)
+    await db.commit()
 
     return db_server
 
 
+async def insert_server_chunk(db: AsyncSession, chunk, user_id: int):
+    # chunk is a list of (row_number, ServerCreate); returns the rejected rows. The caller commits.
+    group_ids = {server.group_id for _, server in chunk if server.group_id is not None}
+    known_groups = set()
+    if group_ids:
+        result = await db.execute(select(Group.id).where(Group.id.in_(group_ids)))
+        known_groups = set(result.scalars().all())
+
+    rejected = [
+        (row_number, [f"Group {server.group_id} does not exist"])
+        for row_number, server in chunk
+        if server.group_id is not None and server.group_id not in known_groups
+    ]
+    valid = [(row_number, server) for row_number, server in chunk
+             if server.group_id is None or server.group_id in known_groups]
+    if not valid:
+        return rejected
+
+    result = await db.execute(
+        insert(Server).returning(Server.id, sort_by_parameter_order=True),
+        [{**server.dict(), "created_by": user_id, "updated_by": user_id} for _, server in valid]
+    )
+    server_ids = result.scalars().all()
+
+    additional = [
+        {"server_id": server_id, "ip_address": address}
+        for server_id, (_, server) in zip(server_ids, valid)
+        for address in parse_ip_list(server.additional_ips)
+    ]
+    if additional:
+        await db.execute(insert(ServerIP), additional)
+
+    # Last, so a statement failing above never leaves a queued change event behind
+    await record_history_bulk(db, [
+        history_row("CREATE", "servers", server_id, {"all": "created"}, user_id) for server_id in server_ids
+    ])
+    return rejected
+
+
+async def insert_server_rows(db: AsyncSession, chunk, user_id: int):
+    # Fallback for a chunk the database rejected: one SAVEPOINT per row, so only the bad rows fail
+    rejected = []
+    for row_number, server in chunk:
+        try:
+            async with db.begin_nested():
+                rejected += await insert_server_chunk(db, [(row_number, server)], user_id)
+        except DBAPIError as e:
+            rejected.append((row_number, [f"Rejected by the database: {e.orig}"]))
+    return rejected
+
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import_servers(
+        request: Request,
+        format: Optional[Literal["csv", "ndjson"]] = None,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 2L"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    content_type = request.headers.get("content-type", "")
+    if format is None:
+        if "csv" in content_type:
+            format = "csv"
+        elif "ndjson" in content_type or "jsonl" in content_type:
+            format = "ndjson"
+        else:
+            raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+
+    # The body is parsed as it streams in and written in chunks, so memory stays bounded by the chunk size
+    records = iter_csv_records(request.stream()) if format == "csv" else iter_ndjson_records(request.stream())
+    report = BulkImportResult()
+    user_id = current_user.id
+
+    def add_error(row_number, errors):
+        report.failed += 1
+        if len(report.errors) < BULK_IMPORT_MAX_ERRORS:
+            report.errors.append(BulkRowError(row=row_number, errors=errors))
+        else:
+            report.errors_truncated = True
+
+    async def flush(chunk):
+        try:
+            rejected = await insert_server_chunk(db, chunk, user_id)
+        except DBAPIError:
+            await db.rollback()
+            rejected = await insert_server_rows(db, chunk, user_id)
+        await db.commit()
+        for row_number, errors in rejected:
+            add_error(row_number, errors)
+        report.created += len(chunk) - len(rejected)
+
+    chunk = []
+    async for row_number, record, error in records:
+        if error:
+            add_error(row_number, [error])
+            continue
+        try:
+            chunk.append((row_number, ServerCreate(**record)))
+        except ValidationError as e:
+            add_error(row_number, [
+                f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in e.errors()
+            ])
+            continue
+
+        if len(chunk) >= BULK_IMPORT_CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+
+    if chunk:
+        await flush(chunk)
+
+    report.errors.sort(key=lambda item: item.row)
+    return report
+
+
+@router.put("/bulk", response_model=ServerBulkUpdateResult)
+async def bulk_update_servers(
+        bulk_update: ServerBulkUpdate,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Admin 1L"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    patch = bulk_update.patch.dict(exclude_unset=True)
+    filters = bulk_update.filter.dict(exclude_unset=True) if bulk_update.filter else {}
+    if not patch:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    if "ip_address" in patch or "additional_ips" in patch:
+        raise HTTPException(status_code=400, detail="IP addresses cannot be bulk-updated")
+    if not bulk_update.ids and not filters:
+        raise HTTPException(status_code=400, detail="Provide ids or a filter")
+
+    # Self-join on the pre-update row so RETURNING can report old and new values in one statement
+    servers = Server.__table__
+    old = servers.alias("old")
+    conditions = [servers.c.id == old.c.id]
+    if bulk_update.ids:
+        conditions.append(old.c.id.in_(bulk_update.ids))
+    for field, value in filters.items():
+        conditions.append(old.c[field] == value)
+    # Skip rows that already have the target values
+    conditions.append(or_(*[old.c[field].is_distinct_from(value) for field, value in patch.items()]))
+
+    result = await db.execute(
+        update(servers)
+        .where(*conditions)
+        .values(**patch, updated_by=current_user.id, updated_at=func.now())
+        .returning(servers.c.id, *[old.c[field] for field in patch])
+    )
+    rows = result.all()
+
+    history = []
+    for row in rows:
+        server_id, old_values = row[0], row[1:]
+        changes = {
+            field: {"old": old_value, "new": new_value}
+            for (field, new_value), old_value in zip(patch.items(), old_values)
+            if old_value != new_value
+        }
+        history.append(history_row("UPDATE", "servers", server_id, changes, current_user.id))
+    await record_history_bulk(db, history)
+
+    await db.commit()
+    if rows and ROLLUP_SERVER_FIELDS & patch.keys():
+        mark_finance_dirty()
+
+    server_ids = sorted(row[0] for row in rows)
+    return {"updated": len(server_ids), "ids": server_ids}
+
+
 @router.put("/{server_id}", response_model=ServerResponse)
 async def update_server(
         server_id: int,
         server_update: ServerUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 1L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    db_server = db.query(Server).filter(Server.id == server_id).first()
+    db_server = await db.get(Server, server_id)
     if not db_server:
         raise HTTPException(status_code=404, detail="Server not found")
 
@@ -99,6 +425,9 @@ async def update_server(
 
     for field, new_value in update_data.items():
         old_value = getattr(db_server, field)
+        if field == "ip_address" and old_value is not None:
+            # inet values load as ipaddress objects
+            old_value = str(old_value)
         if old_value != new_value:
             changes[field] = {"old": old_value, "new": new_value}
             setattr(db_server, field, new_value)
@@ -106,37 +435,30 @@ async def update_server(
     db_server.updated_by = current_user.id
     db_server.updated_at = datetime.utcnow()
 
-    db.add(db_server)
-    db.commit()
-    db.refresh(db_server)
+    if "additional_ips" in changes:
+        await replace_additional_ips(db, server_id, db_server.additional_ips)
 
+    db.add(db_server)
     # Log history if changes were made
     if changes:
-        history = History(
-            action="UPDATE",
-            table_name="servers",
-            record_id=server_id,
-            changes=changes,
-            user_id=current_user.id,
-            server_id=server_id
-        )
-        db.add(history)
-        db.commit()
+        record_history(db, "UPDATE", "servers", server_id, changes, current_user.id)
+    await db.commit()
+    if ROLLUP_SERVER_FIELDS & changes.keys():
+        mark_finance_dirty()
 
     return db_server
 
 
-@router.get("/{server_id}/history")
+@router.get("/{server_id}/history", response_model=List[HistoryResponse])
 async def get_server_history(
         server_id: int,
-        db: Session = Depends(get_db),
+        response: Response,
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 1L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    history = db.query(History).filter(
-        History.server_id == server_id
-    ).order_by(History.timestamp.desc()).all()
-
-    return history
\ No newline at end of file
+    return await read_history(db, response, [History.server_id == server_id], cursor, limit)
\ No newline at end of file
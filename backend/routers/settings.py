@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
-from database import get_db
-from auth import get_current_user, check_permission, get_password_hash
+from database import get_db, get_read_db
+from auth import get_current_user, check_permission, get_password_hash, invalidate_user_cache
 from models import User, Settings
 from schemas import SettingsUpdate, SettingsResponse
 
@@ -12,16 +13,17 @@ router = APIRouter(prefix="/api/settings", tags=["settings"])
 
 @router.get("/", response_model=SettingsResponse)
 async def get_settings(
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    settings = db.query(Settings).filter(Settings.user_id == current_user.id).first()
+    result = await db.execute(select(Settings).where(Settings.user_id == current_user.id))
+    settings = result.scalars().first()
     if not settings:
         # Create default settings if not exist
         settings = Settings(user_id=current_user.id)
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        await db.refresh(settings)
 
     return settings
 
@@ -29,17 +31,18 @@ async def get_settings(
 @router.put("/", response_model=SettingsResponse)
 async def update_settings(
         settings_update: SettingsUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    settings = db.query(Settings).filter(Settings.user_id == current_user.id).first()
+    result = await db.execute(select(Settings).where(Settings.user_id == current_user.id))
+    settings = result.scalars().first()
     if not settings:
         settings = Settings(user_id=current_user.id)
         db.add(settings)
 
     # Update password if provided
     if settings_update.password:
-        current_user.password_hash = get_password_hash(settings_update.password)
+        current_user.password_hash = await get_password_hash(settings_update.password)
         db.add(current_user)
 
     update_data = settings_update.dict(exclude_unset=True, exclude={"password"})
@@ -62,18 +65,20 @@ async def update_settings(
 
     db.add(current_user)
     db.add(settings)
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    await db.refresh(settings)
+    invalidate_user_cache(current_user.username)
 
     return settings
 
 
 @router.get("/profile", response_model=dict)
 async def get_profile(
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
-    settings = db.query(Settings).filter(Settings.user_id == current_user.id).first()
+    result = await db.execute(select(Settings).where(Settings.user_id == current_user.id))
+    settings = result.scalars().first()
 
     return {
         "username": current_user.username,
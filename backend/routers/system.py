@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from database import pool_metrics, replicas
+from background import periodic_tasks
+from dns_resolver import dns_resolver
+from events import event_hub
+from auth import get_current_user, check_permission, user_cache, hashing_pool
+from models import User
+
+router = APIRouter(prefix="/api/system", tags=["system"])
+
+
+@router.get("/pool")
+async def get_pool_stats(
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Super Admin"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    return [metrics.snapshot() for metrics in pool_metrics.values()]
+
+
+@router.get("/replicas")
+async def get_replica_status(
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Super Admin"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    return replicas.status()
+
+
+@router.get("/auth-cache")
+async def get_auth_cache_stats(
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Super Admin"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    return user_cache.stats()
+
+
+@router.get("/hashing")
+async def get_hashing_stats(
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Super Admin"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    return hashing_pool.stats()
+
+
+@router.get("/tasks")
+async def get_background_tasks(
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Super Admin"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    return [task.status() for task in periodic_tasks.values()]
+
+
+@router.get("/dns")
+async def get_dns_resolver_stats(
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Super Admin"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    return dns_resolver.stats()
+
+
+@router.get("/events")
+async def get_event_hub_stats(
+        current_user: User = Depends(get_current_user)
+):
+    if not check_permission(current_user, "Super Admin"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    return event_hub.stats()
@@ -1,58 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select, String
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from datetime import datetime
 
 from database import get_db
-from auth import get_current_user, check_permission, get_password_hash
-from models import User, UserRole, UserStatus, History
+from pagination import paginate, set_next_cursor
+from auth import get_current_user, check_permission, get_password_hash, invalidate_user_cache
+from models import User, UserRole, UserStatus
 from schemas import UserCreate, UserUpdate, UserResponse
+from audit import record_history
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
+        response: Response,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
         search: Optional[str] = None,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    query = db.query(User)
+    query = select(User)
 
     if search:
         search = f"%{search}%"
-        query = query.filter(
+        query = query.where(
             (User.username.ilike(search)) |
             (User.email.ilike(search)) |
             (User.phone_number.ilike(search)) |
-            (User.role.ilike(search))
+            (User.role.cast(String).ilike(search))
         )
 
-    return query.offset(skip).limit(limit).all()
+    result = await db.execute(paginate(query, [(User.id, False)], cursor, skip, limit))
+    users = result.scalars().all()
+    set_next_cursor(response, users, limit, lambda user: [user.id])
+
+    return users
 
 
 @router.post("/", response_model=UserResponse)
 async def create_user(
         user: UserCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
     # Check if user exists
-    existing = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.username == user.username) | (User.email == user.email)
-    ).first()
+    ))
+    existing = result.scalars().first()
     if existing:
         raise HTTPException(status_code=400, detail="Username or email already exists")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
 
     db_user = User(
         username=user.username,
@@ -65,19 +75,9 @@ async def create_user(
     )
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    # Log history
-    history = History(
-        action="CREATE",
-        table_name="users",
-        record_id=db_user.id,
-        changes={"all": "created"},
-        user_id=current_user.id
-    )
-    db.add(history)
-    db.commit()
+    await db.flush()
+    record_history(db, "CREATE", "users", db_user.id, {"all": "created"}, current_user.id)
+    await db.commit()
 
     return db_user
 
@@ -86,14 +86,14 @@ async def create_user(
 async def update_user(
         user_id: int,
         user_update: UserUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     # Check permissions - Admin 2L can update anyone, others can only update themselves
     if current_user.id != user_id and not check_permission(current_user, "Admin 2L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -104,10 +104,12 @@ async def update_user(
 
     changes = {}
     update_data = user_update.dict(exclude_unset=True)
+    # The user cache is keyed by username; a rename must drop the old entry too
+    old_username = db_user.username
 
     # Handle password update
     if "password" in update_data:
-        update_data["password_hash"] = get_password_hash(update_data.pop("password"))
+        update_data["password_hash"] = await get_password_hash(update_data.pop("password"))
 
     for field, new_value in update_data.items():
         old_value = getattr(db_user, field)
@@ -118,20 +120,12 @@ async def update_user(
     db_user.updated_at = datetime.utcnow()
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
     # Log history
     if changes:
-        history = History(
-            action="UPDATE",
-            table_name="users",
-            record_id=user_id,
-            changes=changes,
-            user_id=current_user.id
-        )
-        db.add(history)
-        db.commit()
+        record_history(db, "UPDATE", "users", user_id, changes, current_user.id)
+    await db.commit()
+    invalidate_user_cache(old_username)
+    invalidate_user_cache(db_user.username)
 
     return db_user
 
@@ -139,13 +133,13 @@ async def update_user(
 @router.delete("/{user_id}")
 async def delete_user(
         user_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     if not check_permission(current_user, "Admin 2L"):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -157,18 +151,9 @@ async def delete_user(
     if db_user.id == current_user.id:
         raise HTTPException(status_code=403, detail="Cannot delete yourself")
 
-    db.delete(db_user)
-    db.commit()
-
-    # Log history
-    history = History(
-        action="DELETE",
-        table_name="users",
-        record_id=user_id,
-        changes={"all": "deleted"},
-        user_id=current_user.id
-    )
-    db.add(history)
-    db.commit()
+    await db.delete(db_user)
+    record_history(db, "DELETE", "users", user_id, {"all": "deleted"}, current_user.id)
+    await db.commit()
+    invalidate_user_cache(db_user.username)
 
     return {"message": "User deleted successfully"}
\ No newline at end of file
@@ -1,8 +1,10 @@
 from pydantic import BaseModel, EmailStr, field_validator
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import datetime, date
 from enum import Enum
 
+from iputils import normalize_ip
+
 
 # Enums matching SQLAlchemy models
 class UserRole(str, Enum):
@@ -108,6 +110,15 @@ class ServerBase(BaseModel):
     ssh_port: int = 22
     container_password: Optional[str] = None
 
+    @field_validator("ip_address", mode="before")
+    @classmethod
+    def validate_ip_address(cls, value):
+        # inet columns come back from asyncpg as ipaddress objects
+        address = normalize_ip(str(value))
+        if address is None:
+            raise ValueError("Invalid IP address")
+        return address
+
 
 class ServerCreate(ServerBase):
     pass
@@ -128,6 +139,16 @@ class ServerUpdate(BaseModel):
     ssh_port: Optional[int] = None
     container_password: Optional[str] = None
 
+    @field_validator("ip_address", mode="before")
+    @classmethod
+    def validate_ip_address(cls, value):
+        if value is None:
+            return value
+        address = normalize_ip(str(value))
+        if address is None:
+            raise ValueError("Invalid IP address")
+        return address
+
 
 class ServerResponse(ServerBase):
     id: int
@@ -140,6 +161,43 @@ class ServerResponse(ServerBase):
         from_attributes = True
 
 
+class IPLookupMatch(BaseModel):
+    matched_ip: str
+    source: str  # "primary" or "additional"
+    server: ServerResponse
+
+
+class ServerBulkFilter(BaseModel):
+    status: Optional[ServerStatus] = None
+    group_id: Optional[int] = None
+    project: Optional[str] = None
+    hoster: Optional[str] = None
+    country: Optional[str] = None
+
+
+class ServerBulkUpdate(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[ServerBulkFilter] = None
+    patch: ServerUpdate
+
+
+class ServerBulkUpdateResult(BaseModel):
+    updated: int
+    ids: List[int]
+
+
+class BulkRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class BulkImportResult(BaseModel):
+    created: int = 0
+    failed: int = 0
+    errors: List[BulkRowError] = []
+    errors_truncated: bool = False
+
+
 # Domain schemas
 class DomainBase(BaseModel):
     domain_name: str
@@ -157,11 +215,17 @@ class DomainUpdate(BaseModel):
     status: Optional[DomainStatus] = None
 
 
+class DomainRefreshRequest(BaseModel):
+    ids: List[int]
+
+
 class DomainResponse(DomainBase):
     id: int
     ns_records: Optional[List[str]] = None
     a_records: Optional[List[str]] = None
     aaaa_records: Optional[List[str]] = None
+    last_resolved_at: Optional[datetime] = None
+    resolution_error: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     created_by: Optional[int] = None
@@ -201,6 +265,12 @@ class GroupResponse(GroupBase):
 
 
 # Finance schemas
+def check_billing_period(value):
+    if value is not None and not 1 <= value <= 120:
+        raise ValueError("billing_period_months must be between 1 and 120")
+    return value
+
+
 class FinanceBase(BaseModel):
     server_id: int
     account_status: AccountStatus = AccountStatus.ACTIVE
@@ -208,6 +278,10 @@ class FinanceBase(BaseModel):
     currency: Currency = Currency.USD
     payment_date: datetime
     group_id: Optional[int] = None
+    # None for one-off payments; recurring payment dates roll forward by this many months
+    billing_period_months: Optional[int] = None
+
+    _check_billing_period = field_validator("billing_period_months")(check_billing_period)
 
 
 class FinanceCreate(FinanceBase):
@@ -220,12 +294,69 @@ class FinanceUpdate(BaseModel):
     currency: Optional[Currency] = None
     payment_date: Optional[datetime] = None
     group_id: Optional[int] = None
+    billing_period_months: Optional[int] = None
+
+    _check_billing_period = field_validator("billing_period_months")(check_billing_period)
 
 
 class FinanceResponse(FinanceBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # Only set when a base_currency is requested
+    price_normalized: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class UpcomingPayment(BaseModel):
+    id: int
+    server_id: Optional[int] = None
+    group_id: Optional[int] = None
+    price: Optional[float] = None
+    payment_date: datetime
+    billing_period_months: Optional[int] = None
+    overdue: bool
+
+
+class UpcomingPaymentDay(BaseModel):
+    day: date
+    currency: str
+    total: float
+    count: int
+    overdue: bool
+    total_normalized: Optional[float] = None
+    payments: List[UpcomingPayment]
+
+
+class SpendReportRow(BaseModel):
+    month: Optional[date] = None
+    group_id: Optional[int] = None
+    hoster: Optional[str] = None
+    country: Optional[str] = None
+    project: Optional[str] = None
+    currency: Optional[str] = None
+    total: Optional[float] = None
+    total_normalized: Optional[float] = None
+    accounts: int
+
+
+class ExchangeRateBase(BaseModel):
+    currency: Currency
+    rate_date: date
+    rate_to_usd: float
+
+    @field_validator("rate_to_usd")
+    @classmethod
+    def check_rate(cls, value):
+        if value <= 0:
+            raise ValueError("rate_to_usd must be positive")
+        return value
+
+
+class ExchangeRateResponse(ExchangeRateBase):
+    id: int
 
     class Config:
         from_attributes = True
@@ -265,11 +396,42 @@ class HistoryResponse(HistoryBase):
     id: int
     user_id: Optional[int] = None
     username: Optional[str] = None
+    server_id: Optional[int] = None
+    domain_id: Optional[int] = None
+    finance_id: Optional[int] = None
 
     class Config:
         from_attributes = True
 
 
+class EntityStateResponse(BaseModel):
+    table_name: str
+    record_id: int
+    at: datetime
+    state: Dict[str, Any]
+    base: str  # "snapshot" or "live"
+    base_at: Optional[datetime] = None
+    replayed: int
+
+
+# Change feed schemas
+class ChangeEntry(BaseModel):
+    table: str
+    id: int
+    action: str  # created, updated or deleted
+
+
+class ChangesResponse(BaseModel):
+    cursor: str
+    has_more: bool = False
+    changes: List[ChangeEntry] = []
+    # Current state of every created or updated row listed in `changes`
+    servers: List[ServerResponse] = []
+    domains: List[DomainResponse] = []
+    groups: List[GroupResponse] = []
+    finance: List[FinanceResponse] = []
+
+
 # Login schema
 class LoginRequest(BaseModel):
     username: str
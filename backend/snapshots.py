@@ -0,0 +1,228 @@
+import logging
+import os
+from datetime import datetime, time, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, insert, exists, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from background import PeriodicTask
+from database import SessionLocal
+from history_partitions import HISTORY_RETENTION_MONTHS, is_partitioned, list_partitions
+from models import EntitySnapshot, History, Server, Domain, Group, Finance
+from schemas import ServerResponse, DomainResponse, GroupResponse, FinanceResponse
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "86400"))  # 0 disables the job
+# A new snapshot is taken once an entity has this many diffs since its last one
+SNAPSHOT_MAX_DIFFS = int(os.getenv("SNAPSHOT_MAX_DIFFS", "200"))
+# Diffs younger than this may belong to transactions still in flight; they wait for the next run
+SNAPSHOT_SETTLE_SECONDS = float(os.getenv("SNAPSHOT_SETTLE_SECONDS", "300"))
+SNAPSHOT_BATCH_SIZE = 500
+
+# State is stored in the shape the API returns, which is also the shape of History diffs
+SNAPSHOT_TABLES = {
+    "servers": (Server, ServerResponse),
+    "domains": (Domain, DomainResponse),
+    "groups": (Group, GroupResponse),
+    "finance": (Finance, FinanceResponse),
+}
+# Computed per request, not part of the row
+COMPUTED_FIELDS = {"assigned_servers", "price_normalized"}
+# Written without a History diff (on every save, or by dns_refresh), so replay could not keep them right
+UNRECORDED_FIELDS = {
+    "updated_at", "updated_by", "ns_records", "a_records", "aaaa_records", "last_resolved_at", "resolution_error"
+}
+EXCLUDED_FIELDS = COMPUTED_FIELDS | UNRECORDED_FIELDS
+
+
+def entity_state(table_name: str, row):
+    schema = SNAPSHOT_TABLES[table_name][1]
+    return jsonable_encoder(schema.model_validate(row), exclude=EXCLUDED_FIELDS)
+
+
+async def retained_history_start(db: AsyncSession):
+    # Diffs before the oldest monthly partition were archived and dropped; None while nothing was
+    if HISTORY_RETENTION_MONTHS <= 0 or not await is_partitioned(db):
+        return None
+    partitions = await list_partitions(db)
+    if not partitions:
+        return None
+    return datetime.combine(min(partitions), time.min, tzinfo=timezone.utc)
+
+
+def apply_diff(state, entry, undo: bool = False):
+    # Returns the state after (or, undoing, before) a History entry; None when the entity does not exist
+    if entry.action == "CREATE" and undo:
+        return None
+    if entry.action == "DELETE":
+        return state if undo else None
+    if entry.action == "UPDATE" and state is not None:
+        for field, change in (entry.changes or {}).items():
+            if isinstance(change, dict) and ("old" in change or "new" in change):
+                state[field] = change.get("old" if undo else "new")
+    return state
+
+
+def entity_history(table_name: str, record_id: int):
+    return select(History.id, History.action, History.changes, History.timestamp).where(
+        History.table_name == table_name, History.record_id == record_id
+    )
+
+
+async def state_as_of(db: AsyncSession, table_name: str, record_id: int, at: datetime, history_start=None):
+    # Replays forward from the latest snapshot at or before `at`; without one, walks diffs back
+    # from the earliest later snapshot or the live row. Snapshots older than history_start
+    # (see retained_history_start) are skipped: the diffs after them are gone.
+    snapshots = select(EntitySnapshot).where(
+        EntitySnapshot.table_name == table_name, EntitySnapshot.record_id == record_id
+    )
+    earlier = snapshots.where(EntitySnapshot.taken_at <= at)
+    if history_start is not None:
+        earlier = earlier.where(EntitySnapshot.taken_at >= history_start)
+    base = await db.scalar(earlier.order_by(EntitySnapshot.taken_at.desc()).limit(1))
+    if base is not None:
+        result = await db.execute(
+            entity_history(table_name, record_id)
+            .where(History.timestamp > base.taken_at, History.timestamp <= at)
+            .order_by(History.timestamp, History.id)
+        )
+        entries = result.all()
+        state = dict(base.state)
+        for entry in entries:
+            state = apply_diff(state, entry)
+        return {"state": state, "base": "snapshot", "base_at": base.taken_at, "replayed": len(entries)}
+
+    base = await db.scalar(
+        snapshots.where(EntitySnapshot.taken_at > at).order_by(EntitySnapshot.taken_at).limit(1)
+    )
+    if base is not None:
+        state, base_kind, base_at = dict(base.state), "snapshot", base.taken_at
+    else:
+        row = await db.get(SNAPSHOT_TABLES[table_name][0], record_id)
+        if row is None:
+            return None
+        state, base_kind, base_at = entity_state(table_name, row), "live", None
+
+    query = entity_history(table_name, record_id).where(History.timestamp > at)
+    if base_at is not None:
+        query = query.where(History.timestamp <= base_at)
+    result = await db.execute(query.order_by(History.timestamp.desc(), History.id.desc()))
+    entries = result.all()
+    for entry in entries:
+        state = apply_diff(state, entry, undo=True)
+    return {"state": state, "base": base_kind, "base_at": base_at, "replayed": len(entries)}
+
+
+async def backfill_snapshots(db: AsyncSession, table_name: str, record_id: int, state):
+    # Entities audited long before their first snapshot get older snapshots by undoing diffs,
+    # one every SNAPSHOT_MAX_DIFFS entries
+    result = await db.execute(
+        entity_history(table_name, record_id).order_by(History.timestamp.desc(), History.id.desc())
+    )
+    entries = result.all()
+    snapshots = []
+    for index, entry in enumerate(entries[:-1]):
+        state = apply_diff(state, entry, undo=True)
+        if state is None:
+            break
+        # Valid from the next older entry on; skipped when both share a timestamp (same transaction)
+        older = entries[index + 1]
+        if (index + 1) % SNAPSHOT_MAX_DIFFS == 0 and older.timestamp < entry.timestamp:
+            snapshots.append({
+                "table_name": table_name, "record_id": record_id, "taken_at": older.timestamp, "state": dict(state)
+            })
+    return snapshots
+
+
+async def snapshot_new_entities(db: AsyncSession, table_name: str):
+    # First snapshot of every entity from its live row; rows changed within the settle window wait
+    model = SNAPSHOT_TABLES[table_name][0]
+    has_snapshot = exists().where(EntitySnapshot.table_name == table_name, EntitySnapshot.record_id == model.id)
+    taken = 0
+    last_id = 0
+    while True:
+        taken_at = datetime.now(timezone.utc)
+        recently_changed = exists().where(
+            History.table_name == table_name, History.record_id == model.id,
+            History.timestamp > taken_at - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+        )
+        result = await db.execute(
+            select(model)
+            .where(model.id > last_id, ~has_snapshot, ~recently_changed)
+            .order_by(model.id)
+            .limit(SNAPSHOT_BATCH_SIZE)
+        )
+        rows = result.scalars().all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        states = {row.id: entity_state(table_name, row) for row in rows}
+        snapshots = [
+            {"table_name": table_name, "record_id": record_id, "taken_at": taken_at, "state": state}
+            for record_id, state in states.items()
+        ]
+        result = await db.execute(
+            select(History.record_id)
+            .where(History.table_name == table_name, History.record_id.in_(states))
+            .group_by(History.record_id)
+            .having(func.count() > SNAPSHOT_MAX_DIFFS)
+        )
+        for record_id in result.scalars().all():
+            snapshots += await backfill_snapshots(db, table_name, record_id, dict(states[record_id]))
+
+        await db.execute(insert(EntitySnapshot), snapshots)
+        await db.commit()
+        taken += len(snapshots)
+    return taken
+
+
+async def snapshot_busy_entities(db: AsyncSession, table_name: str):
+    # Entities with SNAPSHOT_MAX_DIFFS diffs since their latest snapshot get a new one, built by replay
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+    latest = (
+        select(EntitySnapshot.record_id, func.max(EntitySnapshot.taken_at).label("taken_at"))
+        .where(EntitySnapshot.table_name == table_name)
+        .group_by(EntitySnapshot.record_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(latest.c.record_id)
+        .join(History, and_(
+            History.table_name == table_name,
+            History.record_id == latest.c.record_id,
+            History.timestamp > latest.c.taken_at,
+            History.timestamp <= cutoff
+        ))
+        .group_by(latest.c.record_id)
+        .having(func.count() >= SNAPSHOT_MAX_DIFFS)
+    )
+
+    snapshots = []
+    history_start = await retained_history_start(db)
+    for record_id in result.scalars().all():
+        replayed = await state_as_of(db, table_name, record_id, cutoff, history_start)
+        if replayed and replayed["state"] is not None:
+            snapshots.append({
+                "table_name": table_name, "record_id": record_id, "taken_at": cutoff, "state": replayed["state"]
+            })
+    if snapshots:
+        await db.execute(insert(EntitySnapshot), snapshots)
+        await db.commit()
+    return len(snapshots)
+
+
+async def take_snapshots():
+    taken = 0
+    for table_name in SNAPSHOT_TABLES:
+        async with SessionLocal() as db:
+            taken += await snapshot_new_entities(db, table_name)
+            taken += await snapshot_busy_entities(db, table_name)
+    if taken:
+        logger.info("Took %d entity snapshots", taken)
+    return taken
+
+
+entity_snapshotter = PeriodicTask("entity-snapshots", SNAPSHOT_INTERVAL, take_snapshots, initial_delay=60)
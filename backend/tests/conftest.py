@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Modules live at the backend root and import each other by flat name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+# An empty database the PostgreSQL tests may create tables in; they are skipped without it
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+
+@pytest.fixture
+def database_url():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    return TEST_DATABASE_URL
@@ -0,0 +1,25 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from database import Base, to_async_url
+from history_partitions import DEFAULT_PARTITION
+
+
+def run_with_database(url, test):
+    # Creates the schema in the test database, empties the tables and hands `test` a sessionmaker
+    async def main():
+        engine = create_async_engine(to_async_url(url), poolclass=NullPool)
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await conn.run_sync(Base.metadata.create_all)
+                # One partition takes every entry, whatever the current month
+                await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF history DEFAULT"))
+                await conn.execute(text("TRUNCATE history, entity_snapshots, groups, users RESTART IDENTITY CASCADE"))
+            await test(async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False))
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
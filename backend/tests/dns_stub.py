@@ -0,0 +1,53 @@
+import asyncio
+from collections import Counter
+
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+STUB_ADDRESS = "192.0.2.10"
+STUB_TTL = 30
+
+
+class StubDNSServer(asyncio.DatagramProtocol):
+    # UDP nameserver on 127.0.0.1 for resolver tests:
+    #   missing*  -> NXDOMAIN
+    #   slow*     -> never answered (the client times out)
+    #   anything else -> A STUB_ADDRESS and one NS record, TTL STUB_TTL; no AAAA records
+
+    def __init__(self):
+        self.transport = None
+        self.queries = Counter()
+
+    @property
+    def port(self):
+        return self.transport.get_extra_info("sockname")[1]
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, local_addr=("127.0.0.1", 0))
+        return self
+
+    def stop(self):
+        self.transport.close()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query = dns.message.from_wire(data)
+        question = query.question[0]
+        name = question.name.to_text()
+        self.queries[(name, dns.rdatatype.to_text(question.rdtype))] += 1
+        if name.startswith("slow"):
+            return
+
+        response = dns.message.make_response(query)
+        if name.startswith("missing"):
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        elif question.rdtype == dns.rdatatype.A:
+            response.answer.append(dns.rrset.from_text(question.name, STUB_TTL, "IN", "A", STUB_ADDRESS))
+        elif question.rdtype == dns.rdatatype.NS:
+            response.answer.append(dns.rrset.from_text(question.name, STUB_TTL, "IN", "NS", "ns1.example.test."))
+        self.transport.sendto(response.to_wire(), addr)
@@ -0,0 +1,82 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, text
+
+from audit import history_row
+from models import History, User, UserRole
+from pagination import encode_cursor
+from routers.changes import change_tables, change_entries, head_cursor, parse_cursor
+from tests.database_setup import run_with_database
+
+TABLES = ["groups"]
+
+
+def entry(record_id: int):
+    return insert(History).values(history_row("UPDATE", "groups", record_id, {}, None))
+
+
+@pytest.mark.parametrize("values", [[1, "2"], [1.5, 2], [None, 2], [-1, 2], [True, 2]])
+def test_cursor_parts_must_be_ids(values):
+    with pytest.raises(HTTPException) as error:
+        parse_cursor(encode_cursor(values))
+    assert error.value.status_code == 400
+
+
+def test_finance_is_left_out_for_roles_that_cannot_list_it():
+    assert "finance" not in change_tables(User(role=UserRole.ADMIN_1L))
+    assert "finance" in change_tables(User(role=UserRole.ADMIN_2L))
+    assert "finance" in change_tables(User(role=UserRole.SERVICE_MANAGER))
+
+
+def test_running_transaction_holds_back_later_commits(database_url):
+    async def test(sessions):
+        async with sessions() as reader, sessions() as slow, sessions() as fast:
+            cursor = await head_cursor(reader, TABLES)
+            await slow.execute(entry(1))
+            await fast.execute(entry(2))
+            await fast.commit()
+            assert await change_entries(reader, TABLES, cursor, 10) == []
+
+            await slow.commit()
+            entries = await change_entries(reader, TABLES, cursor, 10)
+            assert [item.record_id for item in entries] == [1, 2]
+
+    run_with_database(database_url, test)
+
+
+def test_entry_committed_out_of_id_order_is_not_skipped(database_url):
+    async def test(sessions):
+        async with sessions() as reader, sessions() as slow, sessions() as fast:
+            cursor = await head_cursor(reader, TABLES)
+            # `fast` gets the older transaction id, `slow` the lower history id, and `fast` commits first
+            await fast.execute(text("SELECT pg_current_xact_id()"))
+            await slow.execute(entry(1))
+            await fast.execute(entry(2))
+            await fast.commit()
+
+            first = await change_entries(reader, TABLES, cursor, 10)
+            assert [item.record_id for item in first] == [2]
+
+            await slow.commit()
+            second = await change_entries(reader, TABLES, [first[-1].txid, first[-1].id], 10)
+            assert [item.record_id for item in second] == [1]
+            assert second[0].id < first[-1].id
+
+    run_with_database(database_url, test)
+
+
+def test_pages_follow_the_cursor(database_url):
+    async def test(sessions):
+        async with sessions() as db:
+            for record_id in range(1, 6):
+                await db.execute(entry(record_id))
+                await db.commit()
+
+            cursor, seen = [0, 0], []
+            while entries := await change_entries(db, TABLES, cursor, 2):
+                seen += [item.record_id for item in entries]
+                cursor = [entries[-1].txid, entries[-1].id]
+            assert seen == [1, 2, 3, 4, 5]
+            assert await head_cursor(db, TABLES) == cursor
+
+    run_with_database(database_url, test)
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from dns_resolver import DNSResolver
+from tests.dns_stub import StubDNSServer, STUB_ADDRESS
+
+
+def run_with_stub(test, **resolver_options):
+    async def main():
+        stub = await StubDNSServer().start()
+        try:
+            resolver = DNSResolver(nameservers=["127.0.0.1"], port=stub.port, **resolver_options)
+            await test(stub, resolver)
+        finally:
+            stub.stop()
+    asyncio.run(main())
+
+
+def test_positive_answer_is_cached():
+    async def test(stub, resolver):
+        assert await resolver.resolve("ok.test", "A") == ([STUB_ADDRESS], None)
+        assert await resolver.resolve("OK.test", "A") == ([STUB_ADDRESS], None)
+        assert stub.queries[("ok.test.", "A")] == 1
+        assert resolver.stats()["queries"] == 1
+
+    run_with_stub(test)
+
+
+def test_answer_ttl_caps_cache_lifetime():
+    async def test(stub, resolver):
+        await resolver.resolve("ok.test", "A")
+        # The stub publishes TTL 30, the resolver caps it at max_ttl
+        time.sleep(0.3)
+        await resolver.resolve("ok.test", "A")
+        assert stub.queries[("ok.test.", "A")] == 2
+
+    run_with_stub(test, max_ttl=0.2)
+
+
+def test_no_answer_is_an_empty_result():
+    async def test(stub, resolver):
+        assert await resolver.resolve("ok.test", "AAAA") == ([], None)
+
+    run_with_stub(test)
+
+
+def test_nxdomain_is_negatively_cached():
+    async def test(stub, resolver):
+        assert await resolver.resolve("missing.test", "A") == ([], "domain does not exist")
+        assert await resolver.resolve("missing.test", "A") == ([], "domain does not exist")
+        assert stub.queries[("missing.test.", "A")] == 1
+
+    run_with_stub(test, negative_ttl=60)
+
+
+def test_negative_cache_expires():
+    async def test(stub, resolver):
+        await resolver.resolve("missing.test", "A")
+        time.sleep(0.3)
+        await resolver.resolve("missing.test", "A")
+        assert stub.queries[("missing.test.", "A")] == 2
+
+    run_with_stub(test, negative_ttl=0.2)
+
+
+def test_timeout_is_reported_and_not_cached():
+    async def test(stub, resolver):
+        started = time.perf_counter()
+        values, error = await resolver.resolve("slow.test", "A")
+        assert values is None
+        assert error == "timed out after 0.3s"
+        assert time.perf_counter() - started < 2
+
+        await resolver.resolve("slow.test", "A")
+        assert stub.queries[("slow.test.", "A")] >= 2
+        assert resolver.stats()["failures"] == 2
+
+    run_with_stub(test, timeout=0.3)
+
+
+def test_resolve_many_combines_record_types():
+    async def test(stub, resolver):
+        results = await resolver.resolve_many(["ok.test", "missing.test", "ok.test"])
+        assert set(results) == {"ok.test", "missing.test"}
+
+        records, error = results["ok.test"]
+        assert records == {"NS": ["ns1.example.test."], "A": [STUB_ADDRESS], "AAAA": []}
+        assert error is None
+
+        records, error = results["missing.test"]
+        assert records == {"NS": [], "A": [], "AAAA": []}
+        assert error == "NS: domain does not exist; A: domain does not exist; AAAA: domain does not exist"
+
+    run_with_stub(test)
+
+
+def test_concurrency_is_bounded():
+    async def test(stub, resolver):
+        peak = 0
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, resolver.in_flight)
+                await asyncio.sleep(0)
+
+        watcher = asyncio.create_task(watch())
+        await resolver.resolve_many([f"ok{i}.test" for i in range(20)])
+        watcher.cancel()
+        assert 0 < peak <= 4
+        assert resolver.stats()["queries"] == 60
+
+    run_with_stub(test, concurrency=4)
@@ -0,0 +1,26 @@
+import pytest
+
+from events import Subscriber
+from models import User, UserRole
+from routers.events import allowed_tables
+
+
+@pytest.mark.parametrize("requested", [["finance_accounts"], ["finance"], ["servers", "finance"]])
+def test_low_role_cannot_follow_finance(requested):
+    with pytest.raises(PermissionError):
+        allowed_tables(User(role=UserRole.ADMIN_1L), requested)
+
+
+def test_no_filter_means_the_allowed_tables():
+    tables = allowed_tables(User(role=UserRole.ADMIN_1L), [])
+    assert "finance" not in tables
+
+    subscriber = Subscriber(tables)
+    assert subscriber.wants({"type": "change", "table": "servers", "id": 1})
+    assert not subscriber.wants({"type": "change", "table": "finance", "id": 1})
+    assert subscriber.wants({"type": "resync"})
+
+
+def test_finance_roles_may_follow_finance():
+    assert allowed_tables(User(role=UserRole.SERVICE_MANAGER), ["finance"]) == ["finance"]
+    assert "finance" in allowed_tables(User(role=UserRole.ADMIN_2L), [])
@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+from fastapi import Response
+from sqlalchemy import insert
+
+from models import Currency, Finance, User, UserRole
+from routers.finance import get_finance_accounts
+from tests.database_setup import run_with_database
+
+
+def test_same_currency_needs_no_rate(database_url):
+    async def test(sessions):
+        async with sessions() as db:
+            # No exchange rates at all: only the EUR amount converts to EUR
+            await db.execute(insert(Finance), [
+                {"id": 1, "price": 10, "currency": Currency.EUR, "payment_date": datetime(2026, 3, 1, tzinfo=timezone.utc)},
+                {"id": 2, "price": 10, "currency": Currency.UAH, "payment_date": datetime(2026, 3, 1, tzinfo=timezone.utc)},
+            ])
+            await db.commit()
+
+            accounts = await get_finance_accounts(
+                Response(), base_currency=Currency.EUR, db=db, current_user=User(role=UserRole.SUPER_ADMIN)
+            )
+            assert [(account.id, account.price_normalized) for account in accounts] == [(1, 10), (2, None)]
+
+    run_with_database(database_url, test)
@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+
+from models import Finance, User, UserRole
+from routers.finance import finance_search_filter, get_finance_accounts, parse_payment_date
+from tests.database_setup import run_with_database
+
+
+def test_bare_date_is_told_apart_from_midnight():
+    assert parse_payment_date("2026-03-15", "to") == (datetime(2026, 3, 15, tzinfo=timezone.utc), True)
+    assert parse_payment_date("2026-03-15T00:00:00", "to") == (datetime(2026, 3, 15, tzinfo=timezone.utc), False)
+    assert parse_payment_date("2026-03-15T10:00:00+02:00", "to")[0] == datetime(2026, 3, 15, 8, tzinfo=timezone.utc)
+    with pytest.raises(HTTPException) as error:
+        parse_payment_date("15.03.2026", "to")
+    assert error.value.status_code == 400
+
+
+def test_free_text_search_keeps_the_substring_match():
+    sql = str(finance_search_filter("03-1").compile(dialect=postgresql.dialect()))
+    assert "ILIKE" in sql and "to_char(finance.payment_date" in sql
+    assert "ILIKE" not in str(finance_search_filter("2026").compile(dialect=postgresql.dialect()))
+
+
+def test_date_only_upper_bound_includes_the_whole_day(database_url):
+    async def test(sessions):
+        async with sessions() as db:
+            await db.execute(insert(Finance), [
+                {"id": 1, "price": 1, "payment_date": datetime(2026, 3, 15, 18, tzinfo=timezone.utc)},
+                {"id": 2, "price": 1, "payment_date": datetime(2026, 3, 16, 1, tzinfo=timezone.utc)},
+            ])
+            await db.commit()
+
+            admin = User(role=UserRole.SUPER_ADMIN)
+            accounts = await get_finance_accounts(Response(), payment_date_to="2026-03-15", db=db, current_user=admin)
+            assert [account.id for account in accounts] == [1]
+            accounts = await get_finance_accounts(
+                Response(), payment_date_to="2026-03-15T12:00:00Z", db=db, current_user=admin
+            )
+            assert accounts == []
+            accounts = await get_finance_accounts(Response(), search="03-1", db=db, current_user=admin)
+            assert [account.id for account in accounts] == [1, 2]
+
+    run_with_database(database_url, test)
@@ -0,0 +1,34 @@
+from sqlalchemy import insert, select
+
+from models import Server, ServerIP
+from routers.servers import lookup_servers_by_ip, server_ip_match
+from tests.database_setup import run_with_database
+
+
+def test_primary_address_with_prefix_is_a_host(database_url):
+    async def test(sessions):
+        async with sessions() as db:
+            # Server 1's primary was entered as "addr/prefix"; server 3 owns a network through server_ips
+            await db.execute(insert(Server), [
+                {"id": 1, "ip_address": "10.0.0.5/24"},
+                {"id": 2, "ip_address": "10.0.0.9"},
+                {"id": 3, "ip_address": "192.0.2.1"},
+            ])
+            await db.execute(insert(ServerIP).values(server_id=3, ip_address="10.0.0.64/26"))
+            await db.commit()
+
+            async def lookup(ip, mode):
+                matches = await lookup_servers_by_ip(ip, mode, 100, db, None)
+                return [(match["source"], match["server"].id) for match in matches]
+
+            assert await lookup("10.0.0.5", "exact") == [("primary", 1)]
+            assert await lookup("10.0.0.7", "exact") == []
+            assert await lookup("10.0.0.0/28", "within") == [("primary", 1), ("primary", 2)]
+            # Only a stored network owns addresses around it
+            assert await lookup("10.0.0.77", "contains") == [("additional", 3)]
+            assert await lookup("10.0.0.5", "contains") == [("primary", 1)]
+
+            result = await db.execute(select(Server.id).where(server_ip_match("within", "10.0.0.0/25")).order_by(Server.id))
+            assert result.scalars().all() == [1, 2, 3]
+
+    run_with_database(database_url, test)
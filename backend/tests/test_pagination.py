@@ -0,0 +1,70 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql
+
+from models import Group, GroupStatus
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_filter, paginate, set_next_cursor
+from tests.database_setup import run_with_database
+
+
+def compiled(clause):
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_cursor_round_trip_keeps_types():
+    values = [datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc), date(2026, 3, 1), 42, "abc", None]
+    assert decode_cursor(encode_cursor(values), len(values)) == values
+
+
+@pytest.mark.parametrize("cursor", ["not base64 json!", encode_cursor([{"x": 1}]), encode_cursor([1, 2])])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, 1)
+    assert error.value.status_code == 400
+
+
+def test_keyset_filter_uses_a_row_comparison_for_one_direction():
+    clause = keyset_filter([(Group.title, True), (Group.id, True)], ["b", 5])
+    assert compiled(clause) == "(groups.title, groups.id) < ('b', 5)"
+
+
+def test_keyset_filter_expands_mixed_directions():
+    clause = keyset_filter([(Group.title, True), (Group.id, False)], ["b", 5])
+    assert compiled(clause) == "groups.title < 'b' OR groups.title = 'b' AND groups.id > 5"
+
+
+def test_next_cursor_only_on_full_pages():
+    response = Response()
+    set_next_cursor(response, [1], 2, lambda row: [row])
+    assert NEXT_CURSOR_HEADER not in response.headers
+    set_next_cursor(response, [1, 2], 2, lambda row: [row])
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER], 1) == [2]
+
+
+def test_pages_cover_every_row_once(database_url):
+    async def test(sessions):
+        async with sessions() as db:
+            titles = ["b", "a", "b", "c", "a", "b"]
+            await db.execute(insert(Group), [
+                {"title": title, "projects": [], "status": GroupStatus.ENABLED} for title in titles
+            ])
+            await db.commit()
+
+            keys = [(Group.title, True), (Group.id, False)]
+            cursor, seen = None, []
+            while True:
+                response = Response()
+                rows = (await db.execute(paginate(select(Group.title, Group.id), keys, cursor, limit=2))).all()
+                seen += [tuple(row) for row in rows]
+                set_next_cursor(response, rows, 2, lambda row: [row.title, row.id])
+                cursor = response.headers.get(NEXT_CURSOR_HEADER)
+                if not cursor:
+                    break
+            expected = sorted(((title, index + 1) for index, title in enumerate(titles)), key=lambda row: row[1])
+            expected.sort(key=lambda row: row[0], reverse=True)
+            assert seen == expected
+
+    run_with_database(database_url, test)
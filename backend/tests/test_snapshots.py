@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import insert, text
+
+import snapshots
+from audit import history_row
+from models import EntitySnapshot, Group, GroupStatus, History
+from snapshots import apply_diff, entity_state, retained_history_start, state_as_of
+from tests.database_setup import run_with_database
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def diff(action, **changes):
+    return SimpleNamespace(action=action, changes={
+        field: {"old": old, "new": new} for field, (old, new) in changes.items()
+    })
+
+
+def test_apply_diff_forward_and_back():
+    state = {"title": "a", "status": "Enabled"}
+    assert apply_diff(dict(state), diff("UPDATE", title=("a", "b"))) == {"title": "b", "status": "Enabled"}
+    assert apply_diff({"title": "b", "status": "Enabled"}, diff("UPDATE", title=("a", "b")), undo=True) == state
+    # {"all": "created"} carries no field values
+    assert apply_diff(dict(state), SimpleNamespace(action="CREATE", changes={"all": "created"})) == state
+    assert apply_diff(dict(state), diff("CREATE"), undo=True) is None
+    assert apply_diff(dict(state), diff("DELETE")) is None
+    assert apply_diff(dict(state), diff("DELETE"), undo=True) == state
+
+
+def test_unrecorded_fields_are_left_out():
+    group = Group(
+        id=1, title="g", projects=[], status=GroupStatus.ENABLED, description=None, created_at=T0, updated_at=T0
+    )
+    assert set(entity_state("groups", group)) == {"id", "title", "projects", "status", "description", "created_at"}
+
+
+def test_state_as_of_replays_history(database_url):
+    async def test(sessions):
+        async with sessions() as db:
+            await db.execute(insert(Group).values(id=1, title="c", projects=[], status=GroupStatus.ENABLED))
+            for timestamp, action, changes in [
+                (T0, "CREATE", {"all": "created"}),
+                (T0 + timedelta(days=1), "UPDATE", {"title": {"old": "a", "new": "b"}}),
+                (T0 + timedelta(days=2), "UPDATE", {"title": {"old": "b", "new": "c"}}),
+            ]:
+                await db.execute(insert(History).values(
+                    **history_row(action, "groups", 1, changes, None), timestamp=timestamp
+                ))
+            await db.commit()
+
+            # Walked back from the live row
+            replayed = await state_as_of(db, "groups", 1, T0 + timedelta(hours=12))
+            assert (replayed["base"], replayed["replayed"], replayed["state"]["title"]) == ("live", 2, "a")
+            assert "updated_at" not in replayed["state"]
+            assert (await state_as_of(db, "groups", 1, T0 - timedelta(hours=1)))["state"] is None
+
+            await db.execute(insert(EntitySnapshot).values(
+                table_name="groups", record_id=1, taken_at=T0 + timedelta(days=1, hours=1),
+                state={"id": 1, "title": "b"}
+            ))
+            await db.commit()
+
+            # Replayed forward from the snapshot, unless the diffs after it were dropped
+            replayed = await state_as_of(db, "groups", 1, T0 + timedelta(days=2, hours=1))
+            assert (replayed["base"], replayed["replayed"], replayed["state"]) == ("snapshot", 1, {"id": 1, "title": "c"})
+            replayed = await state_as_of(db, "groups", 1, T0 + timedelta(days=2, hours=1), T0 + timedelta(days=2))
+            assert (replayed["base"], replayed["state"]["title"]) == ("live", "c")
+
+    run_with_database(database_url, test)
+
+
+def test_retained_history_starts_at_the_oldest_partition(database_url, monkeypatch):
+    async def test(sessions):
+        async with sessions() as db:
+            await db.execute(text(
+                "CREATE TABLE IF NOT EXISTS history_y2026m01 PARTITION OF history "
+                "FOR VALUES FROM ('2026-01-01') TO ('2026-02-01')"
+            ))
+            await db.commit()
+
+            assert await retained_history_start(db) is None
+            monkeypatch.setattr(snapshots, "HISTORY_RETENTION_MONTHS", 12)
+            assert await retained_history_start(db) == T0
+
+    run_with_database(database_url, test)
@@ -0,0 +1,33 @@
+from typing import Optional
+
+from sqlalchemy import insert
+
+from auth import load_user, user_cache
+from models import User, UserRole
+from routers.users import update_user
+from schemas import UserUpdate
+from tests.database_setup import run_with_database
+
+
+class RenameUpdate(UserUpdate):
+    # UserUpdate has no username field; this stands in for an update that renames
+    username: Optional[str] = None
+
+
+def test_rename_drops_the_cached_old_username(database_url):
+    async def test(sessions):
+        async with sessions() as db:
+            await db.execute(insert(User), [
+                {"username": "before", "email": "before@example.com", "password_hash": "x", "role": UserRole.ADMIN_1L},
+                {"username": "admin", "email": "admin@example.com", "password_hash": "x", "role": UserRole.SUPER_ADMIN},
+            ])
+            await db.commit()
+            assert (await load_user(db, "before")).id == 1
+            assert user_cache.get("before") is not None
+
+            await update_user(1, RenameUpdate(username="after"), db, await load_user(db, "admin"))
+            assert user_cache.get("before") is None
+            assert await load_user(db, "before") is None
+            assert (await load_user(db, "after")).id == 1
+
+    run_with_database(database_url, test)